@@ -1,8 +1,14 @@
 from __future__ import annotations
 
+import base64
+import hashlib
+import hmac
 import logging
-import secrets
+import os
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
 
 from fastapi import Depends
@@ -10,17 +16,45 @@ from fastapi import HTTPException
 from fastapi import status
 from fastapi.security import HTTPAuthorizationCredentials
 from fastapi.security import HTTPBearer
-from passlib.context import CryptContext
 
 from pdf2zh_next.db import get_connection
-from pdf2zh_next.db import init_db
+from pdf2zh_next.db import write_transaction
 
 logger = logging.getLogger(__name__)
 
 SECURITY = HTTPBearer(auto_error=False)
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
-init_db()
+# Hashes use passlib's pbkdf2_sha256 format so existing rows keep verifying:
+# $pbkdf2-sha256$<rounds>$<salt>$<checksum>, base64 with "." for "+", no padding.
+_PBKDF2_PREFIX = "$pbkdf2-sha256$"
+_PBKDF2_ROUNDS = 29000
+_PBKDF2_SALT_SIZE = 16
+
+# Kept as module constants so pooled connections hit sqlite3's statement cache.
+# The planner prefers the UNIQUE autoindex on api_token; pin the covering one.
+# S105 flags the *_TOKEN names; these are SQL texts, not credentials.
+_SQL_GET_BY_TOKEN = """
+    SELECT id, username, display_name, retention_days, api_token
+    FROM users INDEXED BY idx_users_token_cover WHERE api_token = ?
+"""  # noqa: S105
+_SQL_GET_CREDENTIALS = (
+    "SELECT id, password_hash, api_token FROM users WHERE username = ?"
+)
+_SQL_INSERT_USER = """
+    INSERT INTO users (username, password_hash, display_name, api_token)
+    VALUES (?, ?, ?, ?)
+    RETURNING id, username, display_name, retention_days, api_token
+"""
+_SQL_UPDATE_TOKEN = """
+    UPDATE users SET api_token = ?, updated_at = CURRENT_TIMESTAMP
+    WHERE id = ?
+    RETURNING id, username, display_name, retention_days, api_token
+"""  # noqa: S105
+
+_TOKEN_CACHE_SIZE = 1024
+_TOKEN_CACHE_TTL = 60.0
+_TOKEN_CACHE: OrderedDict[str, tuple[float, User]] = OrderedDict()
+_TOKEN_CACHE_LOCK = threading.Lock()
 
 
 @dataclass(slots=True)
@@ -62,72 +96,129 @@ def _row_to_user(row) -> User:
     )
 
 
+def _cache_token(token: str, user: User) -> None:
+    expires_at = time.monotonic() + _TOKEN_CACHE_TTL
+    with _TOKEN_CACHE_LOCK:
+        _TOKEN_CACHE[token] = (expires_at, user)
+        _TOKEN_CACHE.move_to_end(token)
+        while len(_TOKEN_CACHE) > _TOKEN_CACHE_SIZE:
+            _TOKEN_CACHE.popitem(last=False)
+
+
+def _cached_user(token: str) -> User | None:
+    with _TOKEN_CACHE_LOCK:
+        entry = _TOKEN_CACHE.get(token)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            del _TOKEN_CACHE[token]
+            return None
+        _TOKEN_CACHE.move_to_end(token)
+        return user
+
+
+def _invalidate_token(token: str | None) -> None:
+    if not token:
+        return
+    with _TOKEN_CACHE_LOCK:
+        _TOKEN_CACHE.pop(token, None)
+
+
+def _ab64_encode(data: bytes) -> str:
+    return base64.b64encode(data).rstrip(b"=").replace(b"+", b".").decode("ascii")
+
+
+def _ab64_decode(data: str) -> bytes:
+    raw = data.replace(".", "+").encode("ascii")
+    return base64.b64decode(raw + b"=" * (-len(raw) % 4))
+
+
+def _hash_password(password: str) -> str:
+    salt = os.urandom(_PBKDF2_SALT_SIZE)
+    checksum = hashlib.pbkdf2_hmac(
+        "sha256", password.encode("utf-8"), salt, _PBKDF2_ROUNDS
+    )
+    return (
+        f"{_PBKDF2_PREFIX}{_PBKDF2_ROUNDS}"
+        f"${_ab64_encode(salt)}${_ab64_encode(checksum)}"
+    )
+
+
+def _verify_password(password: str, hashed: str) -> bool:
+    if not hashed.startswith(_PBKDF2_PREFIX):
+        return False
+    try:
+        rounds, salt, checksum = hashed[len(_PBKDF2_PREFIX) :].split("$")
+        expected = _ab64_decode(checksum)
+        derived = hashlib.pbkdf2_hmac(
+            "sha256", password.encode("utf-8"), _ab64_decode(salt), int(rounds)
+        )
+    except ValueError:
+        logger.warning("Malformed password hash in database")
+        return False
+    return hmac.compare_digest(derived, expected)
+
+
 def _generate_token() -> str:
-    return secrets.token_urlsafe(32)
+    # Same output as secrets.token_urlsafe(32), without the wrapper calls.
+    return base64.urlsafe_b64encode(os.urandom(32)).rstrip(b"=").decode("ascii")
 
 
 def register_user(username: str, password: str) -> tuple[User, str]:
     username = username.strip()
     if not username:
         raise ValueError("Username cannot be empty")
-    hashed = pwd_context.hash(password)
+    hashed = _hash_password(password)
     token = _generate_token()
-    with get_connection() as conn:
-        cursor = conn.cursor()
+    conflict = None
+    with write_transaction() as conn:
         try:
-            cursor.execute(
-                """
-                INSERT INTO users (username, password_hash, display_name, api_token)
-                VALUES (?, ?, ?, ?)
-                """,
-                (username, hashed, username, token),
-            )
+            row = conn.execute(
+                _SQL_INSERT_USER, (username, hashed, username, token)
+            ).fetchone()
         except sqlite3.IntegrityError as exc:
-            logger.warning("Failed to register user %s: %s", username, exc)
-            raise UserExistsError from exc
-        user_id = cursor.lastrowid
-        conn.commit()
-        cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-        row = cursor.fetchone()
+            conflict = exc
+    if conflict is not None:
+        logger.warning("Failed to register user %s: %s", username, conflict)
+        raise UserExistsError from conflict
     if not row:
         raise RuntimeError("Failed to load newly created user")
     user = _row_to_user(row)
+    _cache_token(token, user)
     return user, token
 
 
 def authenticate_user(username: str, password: str) -> tuple[User, str]:
     username = username.strip()
-    with get_connection() as conn:
-        cursor = conn.execute(
-            "SELECT * FROM users WHERE username = ?",
-            (username,),
-        )
-        row = cursor.fetchone()
-        if not row:
-            raise InvalidCredentialsError
-        if not pwd_context.verify(password, row["password_hash"]):
-            raise InvalidCredentialsError
-        token = _generate_token()
-        conn.execute(
-            "UPDATE users SET api_token = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-            (token, row["id"]),
-        )
-        conn.commit()
-        row = dict(row)
-        row["api_token"] = token
-    return _row_to_user(row), token
+    with get_connection(readonly=True) as conn:
+        row = conn.execute(_SQL_GET_CREDENTIALS, (username,)).fetchone()
+    if not row:
+        raise InvalidCredentialsError
+    if not _verify_password(password, row["password_hash"]):
+        raise InvalidCredentialsError
+    token = _generate_token()
+    with write_transaction() as conn:
+        updated = conn.execute(_SQL_UPDATE_TOKEN, (token, row["id"])).fetchone()
+    if not updated:
+        raise InvalidCredentialsError
+    _invalidate_token(row["api_token"])
+    user = _row_to_user(updated)
+    _cache_token(token, user)
+    return user, token
 
 
 def get_user_by_token(token: str) -> User | None:
-    with get_connection() as conn:
-        cursor = conn.execute(
-            "SELECT * FROM users WHERE api_token = ?",
-            (token,),
-        )
-        row = cursor.fetchone()
+    user = _cached_user(token)
+    if user is not None:
+        return user
+    with get_connection(readonly=True) as conn:
+        row = conn.execute(_SQL_GET_BY_TOKEN, (token,)).fetchone()
     if not row:
         return None
-    return _row_to_user(row)
+    user = _row_to_user(row)
+    _cache_token(token, user)
+    return user
 
 
 def get_optional_user(
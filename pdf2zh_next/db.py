@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+import functools
 import os
+import queue
 import sqlite3
+import threading
+from collections.abc import Iterator
 from contextlib import contextmanager
 from pathlib import Path
 
@@ -10,7 +14,21 @@ from pdf2zh_next.const import DEFAULT_CONFIG_DIR
 
 DEFAULT_DB_PATH = DEFAULT_CONFIG_DIR / "auth.db"
 
+_WAL_ENABLED = False
+_INITIALIZED = False
+_INIT_LOCK = threading.Lock()
 
+# PRAGMAs are connection-scoped, so every new connection gets the full set.
+_CONNECTION_PRAGMAS = (
+    "busy_timeout=5000",
+    "synchronous=NORMAL",
+    "cache_size=-20000",
+    "temp_store=memory",
+    "foreign_keys=ON",
+)
+
+
+@functools.lru_cache(maxsize=1)
 def _get_db_path() -> Path:
     custom = os.getenv("PDF2ZH_DB_PATH")
     if custom:
@@ -21,61 +39,292 @@ def _get_db_path() -> Path:
     return path
 
 
-def init_db() -> None:
-    path = _get_db_path()
-    with sqlite3.connect(path) as conn:
-        conn.execute("PRAGMA journal_mode=WAL;")
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                display_name TEXT,
-                api_token TEXT UNIQUE,
-                retention_days INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """
+def _configure(conn: sqlite3.Connection, readonly: bool = False) -> None:
+    global _WAL_ENABLED
+    if not _WAL_ENABLED and not readonly:
+        # journal_mode is persisted in the database file, so one check suffices.
+        mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+        _WAL_ENABLED = str(mode).lower() == "wal"
+    for pragma in _CONNECTION_PRAGMAS:
+        conn.execute(f"PRAGMA {pragma}")
+
+
+# Timestamps are microseconds since the Unix epoch (UTC). Unfinished tasks are
+# claimed by the API process that queued them, which keeps renewing the lease.
+_TASKS_COLUMNS = """(
+    id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    input_path TEXT NOT NULL,
+    output_dir TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    updated_at INTEGER NOT NULL,
+    retention_days INTEGER,
+    progress REAL DEFAULT 0,
+    message TEXT,
+    claimed_by TEXT,
+    lease_expires INTEGER
+)"""
+
+
+def _create_schema(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            display_name TEXT,
+            api_token TEXT UNIQUE,
+            retention_days INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS tasks (
-                id TEXT PRIMARY KEY,
-                owner TEXT NOT NULL,
-                filename TEXT NOT NULL,
-                input_path TEXT NOT NULL,
-                output_dir TEXT NOT NULL,
-                status TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL,
-                retention_days INTEGER,
-                progress REAL DEFAULT 0,
-                message TEXT,
-                result_json TEXT,
-                events_json TEXT
-            )
-            """
+        """
+    )
+    # Covers every column of the token lookup, so it never touches the table.
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_users_token_cover
+        ON users (api_token, id, username, display_name, retention_days)
+        """
+    )
+    conn.execute(f"CREATE TABLE IF NOT EXISTS tasks {_TASKS_COLUMNS}")
+    # Large JSON payloads live in side tables so task listings stay small.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS task_payloads (
+            task_id TEXT PRIMARY KEY REFERENCES tasks(id) ON DELETE CASCADE,
+            result_json TEXT
+        )
+        """
+    )
+    # One row per streamed event, so appending never rewrites earlier ones.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS task_events (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id TEXT NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+            event_json TEXT NOT NULL
         )
-        conn.execute(
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_task_events_task
+        ON task_events (task_id, seq)
+        """
+    )
+    _migrate_task_payloads(conn)
+    _migrate_task_timestamps(conn)
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_tasks_owner_created
+        ON tasks (owner, created_at DESC)
+        """
+    )
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> dict[str, str]:
+    """Map column names to their declared types."""
+    return {
+        row["name"]: row["type"].upper()
+        for row in conn.execute(f"PRAGMA table_info({table})")
+    }
+
+
+def _migrate(conn: sqlite3.Connection, statements: tuple[str, ...]) -> None:
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for statement in statements:
+            conn.execute(statement)
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _migrate_task_payloads(conn: sqlite3.Connection) -> None:
+    """Move result/events JSON from legacy ``tasks`` columns to side tables."""
+    if "events_json" not in _table_columns(conn, "tasks"):
+        return
+    _migrate(
+        conn,
+        (
             """
-            CREATE INDEX IF NOT EXISTS idx_tasks_owner_created
-            ON tasks (owner, created_at DESC)
+            INSERT OR IGNORE INTO task_payloads (task_id, result_json)
+            SELECT id, result_json FROM tasks
+            """,
             """
+            INSERT INTO task_events (task_id, event_json)
+            SELECT tasks.id, event.value
+            FROM tasks, json_each(tasks.events_json) AS event
+            WHERE tasks.events_json IS NOT NULL
+            ORDER BY tasks.id, event.key
+            """,
+            "ALTER TABLE tasks DROP COLUMN result_json",
+            "ALTER TABLE tasks DROP COLUMN events_json",
+        ),
+    )
+
+
+def _migrate_task_timestamps(conn: sqlite3.Connection) -> None:
+    """Rebuild ``tasks`` with INTEGER microsecond timestamps.
+
+    Column types cannot be altered in place, and TEXT affinity would turn the
+    integers back into strings, so the rows are copied into a new table.
+    Foreign keys are off meanwhile so dropping the old table does not cascade
+    into ``task_payloads`` and ``task_events``.
+    """
+    if _table_columns(conn, "tasks").get("created_at") != "TEXT":
+        return
+    conn.execute("PRAGMA foreign_keys=OFF")
+    try:
+        _migrate(
+            conn,
+            (
+                "DROP TABLE IF EXISTS tasks_new",
+                f"CREATE TABLE tasks_new {_TASKS_COLUMNS}",
+                # Legacy rows hold naive UTC isoformat() text; the fraction is
+                # always six digits when present, so both parts convert exactly.
+                """
+                INSERT INTO tasks_new (
+                    id, owner, filename, input_path, output_dir, status,
+                    created_at, updated_at, retention_days, progress, message
+                )
+                SELECT id, owner, filename, input_path, output_dir, status,
+                    CAST(strftime('%s', created_at) AS INTEGER) * 1000000
+                        + CAST(substr(created_at, 21) AS INTEGER),
+                    CAST(strftime('%s', updated_at) AS INTEGER) * 1000000
+                        + CAST(substr(updated_at, 21) AS INTEGER),
+                    retention_days, progress, message
+                FROM tasks
+                """,
+                "DROP TABLE tasks",
+                "ALTER TABLE tasks_new RENAME TO tasks",
+            ),
         )
-        conn.commit()
+    finally:
+        conn.execute("PRAGMA foreign_keys=ON")
 
 
-@contextmanager
-def get_connection() -> sqlite3.Connection:
+def _ensure_schema(conn: sqlite3.Connection) -> None:
+    global _INITIALIZED
+    with _INIT_LOCK:
+        if _INITIALIZED:
+            return
+        _create_schema(conn)
+        _INITIALIZED = True
+
+
+def init_db() -> None:
+    """Create the schema once per process.
+
+    The DDL runs on the first writer connection, which then stays in the pool.
+    """
+    if _INITIALIZED:
+        return
+    _WRITE_POOL.release(_WRITE_POOL.acquire())
+
+
+def _connect(readonly: bool) -> sqlite3.Connection:
     path = _get_db_path()
-    conn = sqlite3.connect(path)
+    if readonly:
+        # Read-only connections never take the write lock, so WAL readers
+        # can run alongside the writer.
+        target = f"{path.resolve().as_uri()}?mode=ro"
+    else:
+        target = str(path)
+    # Autocommit mode: multi-statement writes use explicit transactions.
+    conn = sqlite3.connect(
+        target,
+        uri=readonly,
+        check_same_thread=False,
+        isolation_level=None,
+        cached_statements=256,
+    )
     conn.row_factory = sqlite3.Row
+    _configure(conn, readonly)
+    if not readonly:
+        _ensure_schema(conn)
+    return conn
+
+
+class _ConnectionPool:
+    """Bounded pool of long-lived connections, opened lazily on demand.
+
+    The semaphore counts checked-out connections, so releasing or discarding
+    one always lets a waiting thread proceed, reusing an idle connection or
+    opening a replacement.
+    """
+
+    def __init__(self, size: int, readonly: bool) -> None:
+        self._readonly = readonly
+        self._idle: queue.SimpleQueue[sqlite3.Connection] = queue.SimpleQueue()
+        self._slots = threading.BoundedSemaphore(max(1, size))
+
+    def acquire(self) -> sqlite3.Connection:
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return _connect(self._readonly)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        self._idle.put(conn)
+        self._slots.release()
+
+    def discard(self, conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        finally:
+            self._slots.release()
+
+
+_READ_POOL = _ConnectionPool(os.cpu_count() or 1, readonly=True)
+_WRITE_POOL = _ConnectionPool(1, readonly=False)
+
+
+@contextmanager
+def get_connection(readonly: bool = False) -> Iterator[sqlite3.Connection]:
+    if not _INITIALIZED:
+        init_db()
+    pool = _READ_POOL if readonly else _WRITE_POOL
+    conn = pool.acquire()
     try:
         yield conn
-    finally:
-        conn.close()
+    except BaseException as exc:
+        # Only replace connections that SQLite itself failed on or that are
+        # still mid-transaction; other errors leave them reusable.
+        if isinstance(exc, sqlite3.Error) or conn.in_transaction:
+            pool.discard(conn)
+        else:
+            pool.release(conn)
+        raise
+    pool.release(conn)
+
+
+@contextmanager
+def write_transaction() -> Iterator[sqlite3.Connection]:
+    """Run the block on the writer inside ``BEGIN IMMEDIATE`` ... ``COMMIT``.
+
+    Taking the write lock up front avoids SQLITE_BUSY from upgrading a
+    deferred read transaction halfway through.
+    """
+    with get_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
 
 
-__all__ = ["init_db", "get_connection"]
+__all__ = ["init_db", "get_connection", "write_transaction"]
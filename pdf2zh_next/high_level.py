@@ -8,6 +8,7 @@ import queue
 import threading
 import traceback
 from collections.abc import AsyncGenerator
+from functools import lru_cache
 from functools import partial
 from logging.handlers import QueueHandler
 from pathlib import Path
@@ -421,7 +422,9 @@ def _get_glossaries(settings: SettingsModel) -> list[Glossary] | None:
 
 
 
+@lru_cache(maxsize=1)
 def _ort_available_providers():
+    # 每次建表格模型都会查询；onnxruntime 的导入与 provider 探测只需做一次
     try:
         import onnxruntime as ort  # type: ignore
         providers = list(ort.get_available_providers() or [])
@@ -437,7 +440,7 @@ def _ort_available_providers():
 
 
 def get_onnxruntime_diag() -> dict:
-    info = _ort_available_providers()
+    info = dict(_ort_available_providers())
     gpu_available = "CUDAExecutionProvider" in set(info["providers"])
     info["gpu_available"] = gpu_available
     return info
@@ -514,6 +517,22 @@ def _make_rapidocr_model_gpu_first():
             logger.warning(f"RapidOCRModel() default construction failed, disable table model. reason={e2}")
             return None
 
+_RAPIDOCR_MODEL = None
+_RAPIDOCR_MODEL_LOCK = threading.Lock()
+
+
+def _get_shared_rapidocr_model():
+    """
+    复用进程内已构造的 RapidOCR 模型，避免每个任务重复创建 ONNX 会话。
+    RapidOCRModel 内部自带锁，可在任务间共享；构造失败（返回 None）时下次仍会重试。
+    """
+    global _RAPIDOCR_MODEL
+    with _RAPIDOCR_MODEL_LOCK:
+        if _RAPIDOCR_MODEL is None:
+            _RAPIDOCR_MODEL = _make_rapidocr_model_gpu_first()
+        return _RAPIDOCR_MODEL
+
+
 def create_babeldoc_config(settings: SettingsModel, file: Path) -> BabelDOCConfig:
     if not isinstance(settings, SettingsModel):
         raise ValueError(f"{type(settings)} is not SettingsModel")
@@ -544,7 +563,7 @@ def create_babeldoc_config(settings: SettingsModel, file: Path) -> BabelDOCConfi
     table_model = None
     if settings.pdf.translate_table_text:
         # 优先使用 CUDA 以加速表格检测；若不可用则回退至 CPU
-        table_model = _make_rapidocr_model_gpu_first()
+        table_model = _get_shared_rapidocr_model()
 
     babeldoc_config = BabelDOCConfig(
         input_file=file,
@@ -1,29 +1,50 @@
 from __future__ import annotations
 
 import asyncio
+import copy
+import functools
+import io
 import json
 import logging
+import secrets
 import tempfile
-import uuid
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Iterator
+from contextlib import asynccontextmanager
+from contextlib import suppress
 from dataclasses import dataclass, field
 from datetime import datetime
-from datetime import timedelta
+from datetime import timezone
+from email.utils import formatdate
+from email.utils import parsedate_to_datetime
 from enum import Enum
 from pathlib import Path
 from typing import Any
+from typing import BinaryIO
 
 from fastapi import Depends
 from fastapi import FastAPI
 from fastapi import File
 from fastapi import Form
+from fastapi import Header
 from fastapi import HTTPException
+from fastapi import Request
 from fastapi import UploadFile
 from fastapi import status
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+import orjson
 import os
 import subprocess
 import shutil
+import sys
 from pydantic import BaseModel
 from pydantic import ConfigDict
 from pydantic import Field
@@ -43,12 +64,132 @@ from pdf2zh_next.config.cli_env_model import CLIEnvSettingsModel
 from pdf2zh_next.config.main import ConfigManager
 from pdf2zh_next.config.model import SettingsModel
 from pdf2zh_next.db import get_connection
+from pdf2zh_next.db import init_db
+from pdf2zh_next.db import write_transaction
 from pdf2zh_next.high_level import TranslationError
 from pdf2zh_next.high_level import do_translate_async_stream
 
 logger = logging.getLogger(__name__)
 
 
+def _env_int(name: str, default: int, minimum: int = 1) -> int:
+    """Read a positive integer setting, warning about and ignoring bad values."""
+    raw = os.environ.get(name)
+    if not raw:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        logger.warning("Ignoring %s=%r: not an integer", name, raw)
+        return default
+    if value < minimum:
+        logger.warning("Raising %s=%d to the minimum of %d", name, value, minimum)
+        return minimum
+    return value
+
+
+_UPLOAD_CHUNK_SIZE = 1024 * 1024
+_ARCHIVE_CHUNK_SIZE = 1024 * 1024
+# Streamed events are written every N events or T seconds, whichever first.
+_EVENT_BATCH_SIZE = 50
+_EVENT_BATCH_INTERVAL = 0.1
+_DETAIL_CACHE_SIZE = 256
+# Only the newest events of a task are kept; the terminal event is always last.
+_MAX_EVENTS = _env_int("P2Z_MAX_EVENTS", 512)
+_REAP_INTERVAL = 300.0
+# Leases outlive a few missed renewals; the reaper loop renews them.
+_LEASE_TTL_US = int(3 * _REAP_INTERVAL * 1_000_000)
+
+# Statement texts are kept constant so sqlite3's per-connection cache reuses them.
+_SQL_INSERT_TASK = """
+    INSERT INTO tasks (
+        id, owner, filename, input_path, output_dir, status,
+        created_at, updated_at, retention_days, progress,
+        message, claimed_by, lease_expires
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+_SQL_INSERT_PAYLOAD = "INSERT INTO task_payloads (task_id, result_json) VALUES (?, ?)"
+_SQL_UPSERT_RESULT = """
+    INSERT INTO task_payloads (task_id, result_json)
+    VALUES (?, ?)
+    ON CONFLICT (task_id) DO UPDATE
+    SET result_json = excluded.result_json
+"""
+_SQL_INSERT_EVENT = "INSERT INTO task_events (task_id, event_json) VALUES (?, ?)"
+_SQL_TRIM_EVENTS = """
+    DELETE FROM task_events
+    WHERE task_id = ? AND seq <= (
+        SELECT seq FROM task_events WHERE task_id = ?
+        ORDER BY seq DESC LIMIT 1 OFFSET ?
+    )
+"""
+# Expired tasks are invisible to every read; the reaper deletes them later.
+# The last parameter of each read is the current time in microseconds.
+_SQL_SELECT_TASK = """
+    SELECT tasks.*, task_payloads.result_json
+    FROM tasks LEFT JOIN task_payloads ON task_payloads.task_id = tasks.id
+    WHERE tasks.id = ? AND (
+        tasks.retention_days IS NULL
+        OR tasks.created_at >= ? - tasks.retention_days * 86400000000
+    )
+"""
+_SQL_SELECT_EVENTS = "SELECT event_json FROM task_events WHERE task_id = ? ORDER BY seq"
+_SQL_SELECT_STAMP = """
+    SELECT owner, updated_at FROM tasks
+    WHERE id = ? AND (
+        retention_days IS NULL OR created_at >= ? - retention_days * 86400000000
+    )
+"""
+# idx_tasks_owner_created serves both the filter on owner and the ordering.
+_SQL_LIST_TASKS = """
+    SELECT * FROM tasks
+    WHERE owner = ? AND (
+        retention_days IS NULL OR created_at >= ? - retention_days * 86400000000
+    )
+    ORDER BY created_at DESC
+    LIMIT ?
+"""
+# NULL parameters leave the column unchanged.
+_SQL_UPDATE_TASK = """
+    UPDATE tasks SET
+        status = COALESCE(?, status),
+        progress = COALESCE(?, progress),
+        message = COALESCE(?, message),
+        retention_days = COALESCE(?, retention_days),
+        updated_at = ?
+    WHERE id = ?
+"""
+_SQL_UPDATE_TASK_RETURNING = _SQL_UPDATE_TASK + " RETURNING *"
+_SQL_SELECT_RESULT = "SELECT result_json FROM task_payloads WHERE task_id = ?"
+_SQL_TOUCH_TASK = """
+    UPDATE tasks SET progress = COALESCE(?, progress), updated_at = ?
+    WHERE id = ?
+"""
+_SQL_DELETE_TASK = "DELETE FROM tasks WHERE id = ?"
+_SQL_START_TASK = """
+    UPDATE tasks SET status = 'RUNNING', updated_at = ?
+    WHERE id = ? AND status = 'PENDING'
+"""
+_SQL_RENEW_LEASES = """
+    UPDATE tasks SET lease_expires = ?
+    WHERE claimed_by = ? AND status IN ('PENDING', 'RUNNING')
+"""
+# Fails unfinished tasks claimed by the given process, or whose lease ran out
+# (their process is gone). Rows without a lease predate leases entirely.
+_SQL_FAIL_UNFINISHED = """
+    UPDATE tasks SET status = 'FAILED', message = ?, updated_at = ?
+    WHERE status IN ('PENDING', 'RUNNING')
+      AND (claimed_by = ? OR COALESCE(lease_expires, 0) < ?)
+    RETURNING id
+"""
+_SQL_DELETE_EXPIRED = """
+    DELETE FROM tasks
+    WHERE retention_days IS NOT NULL
+      AND created_at < ? - retention_days * 86400000000
+    RETURNING id
+"""
+
+
 class TaskStatus(str, Enum):
     PENDING = "PENDING"
     RUNNING = "RUNNING"
@@ -62,6 +203,13 @@ class ResultMode(str, Enum):
     original = "original"
 
 
+_MODE_KEY: dict[ResultMode, str] = {
+    ResultMode.mono: "mono_pdf",
+    ResultMode.dual: "dual_pdf",
+    ResultMode.original: "original_pdf",
+}
+
+
 @dataclass
 class TaskRecord:
     """Internal task representation."""
@@ -72,13 +220,15 @@ class TaskRecord:
     input_path: Path
     output_dir: Path
     status: TaskStatus
-    created_at: datetime
-    updated_at: datetime
+    created_at: int  # microseconds since the epoch, UTC
+    updated_at: int
     retention_days: int | None = None
     progress: float = 0.0
     message: str | None = None
     result: dict[str, Any] | None = None
     events: list[dict[str, Any]] = field(default_factory=list)
+    claimed_by: str | None = None
+    lease_expires: int | None = None
 
 
 class TaskResultModel(BaseModel):
@@ -133,23 +283,70 @@ def _profile_from_user(user: User) -> UserProfileModel:
     )
 
 
-def _is_expired(record: TaskRecord) -> bool:
-    if record.retention_days is None:
-        return False
-    return datetime.utcnow() - record.created_at > timedelta(days=record.retention_days)
+def _json_default(value: Any) -> Any:
+    # orjson handles datetime, dataclasses and containers itself and only calls
+    # this for the rest; keep the old stringify-anything fallback.
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+def _dumps(value: Any) -> str:
+    # Stored in TEXT columns, so decode orjson's bytes once here.
+    return orjson.dumps(
+        value,
+        default=_json_default,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+    ).decode()
+
+
+def _now_us() -> int:
+    return time.time_ns() // 1000
+
+
+def _from_us(timestamp: int) -> datetime:
+    return datetime.fromtimestamp(timestamp / 1_000_000, tz=timezone.utc)
+
+
+class _DetailCache:
+    """Serialized task detail bodies, valid while ``updated_at`` is unchanged."""
+
+    def __init__(self, size: int) -> None:
+        self._size = size
+        self._entries: OrderedDict[str, tuple[int, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, task_id: str, updated_at: int) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(task_id)
+            if entry is None or entry[0] != updated_at:
+                return None
+            self._entries.move_to_end(task_id)
+            return entry[1]
+
+    def put(self, task_id: str, updated_at: int, body: bytes) -> None:
+        with self._lock:
+            self._entries[task_id] = (updated_at, body)
+            self._entries.move_to_end(task_id)
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+    def discard(self, task_id: str) -> None:
+        with self._lock:
+            self._entries.pop(task_id, None)
+
+
+_detail_cache = _DetailCache(_DETAIL_CACHE_SIZE)
 
 
 class TaskStorage:
     """SQLite-backed persistent task storage."""
 
-    def __init__(self) -> None:
-        self._lock = asyncio.Lock()
-
-    def _row_to_record(self, row) -> TaskRecord:
-        created_at = datetime.fromisoformat(row["created_at"])
-        updated_at = datetime.fromisoformat(row["updated_at"])
-        events = json.loads(row["events_json"]) if row["events_json"] else []
-        result = json.loads(row["result_json"]) if row["result_json"] else None
+    def _row_to_record(
+        self, row, events: list[dict[str, Any]] | None = None
+    ) -> TaskRecord:
+        result_json = row["result_json"] if "result_json" in row.keys() else None
+        result = orjson.loads(result_json) if result_json else None
         return TaskRecord(
             id=row["id"],
             owner=row["owner"],
@@ -157,184 +354,468 @@ class TaskStorage:
             input_path=Path(row["input_path"]),
             output_dir=Path(row["output_dir"]),
             status=TaskStatus(row["status"]),
-            created_at=created_at,
-            updated_at=updated_at,
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
             retention_days=row["retention_days"],
             progress=row["progress"] or 0.0,
             message=row["message"],
             result=result,
-            events=events,
+            events=events if events is not None else [],
+            claimed_by=row["claimed_by"],
+            lease_expires=row["lease_expires"],
         )
 
+    # Blocking sqlite3 work runs in worker threads via asyncio.to_thread so the
+    # event loop keeps serving requests; the connection pools bound concurrency.
     async def create(self, record: TaskRecord) -> TaskRecord:
-        async with self._lock:
-            with get_connection() as conn:
-                conn.execute(
-                    """
-                    INSERT INTO tasks (
-                        id, owner, filename, input_path, output_dir, status,
-                        created_at, updated_at, retention_days, progress,
-                        message, result_json, events_json
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        record.id,
-                        record.owner,
-                        record.filename,
-                        str(record.input_path),
-                        str(record.output_dir),
-                        record.status.value,
-                        record.created_at.isoformat(),
-                        record.updated_at.isoformat(),
-                        record.retention_days,
-                        record.progress,
-                        record.message,
-                        json.dumps(record.result) if record.result else None,
-                        json.dumps(record.events),
-                    ),
-                )
-                conn.commit()
+        return await asyncio.to_thread(self._create_sync, record)
+
+    async def get(self, task_id: str, with_events: bool = True) -> TaskRecord:
+        """Load a task; ``with_events=False`` skips reading its event rows."""
+        return await asyncio.to_thread(self._get_sync, task_id, with_events)
+
+    async def list(self, owner: str, limit: int = 20) -> list[TaskRecord]:
+        return await asyncio.to_thread(self._list_sync, owner, limit)
+
+    async def stamp(self, task_id: str) -> tuple[str, int]:
+        """Return ``(owner, updated_at)`` without loading payloads or events."""
+        return await asyncio.to_thread(self._stamp_sync, task_id)
+
+    async def update(self, task_id: str, **kwargs: Any) -> TaskRecord:
+        """Apply changes and return the updated record, without its events."""
+        return await asyncio.to_thread(self._update_sync, task_id, kwargs, True)
+
+    async def update_fields(self, task_id: str, **kwargs: Any) -> None:
+        """Like :meth:`update` for callers that do not need the record back."""
+        await asyncio.to_thread(self._update_sync, task_id, kwargs, False)
+
+    async def append_event(self, task_id: str, event: dict[str, Any]) -> None:
+        await self.extend_events(task_id, [_dumps(event)])
+
+    async def extend_events(
+        self,
+        task_id: str,
+        encoded_events: list[str],
+        progress: float | None = None,
+    ) -> None:
+        """Append JSON-encoded events and optionally set progress in one transaction."""
+        await asyncio.to_thread(
+            self._extend_events_sync, task_id, encoded_events, progress
+        )
+
+    async def delete(self, task_id: str) -> None:
+        await asyncio.to_thread(self._delete_sync, task_id)
+
+    async def delete_expired(self) -> list[str]:
+        """Delete tasks past their retention and return their ids."""
+        return await asyncio.to_thread(self._delete_expired_sync)
+
+    async def start(self, task_id: str) -> bool:
+        """Move a PENDING task to RUNNING; False if it is no longer pending."""
+        return await asyncio.to_thread(self._start_sync, task_id)
+
+    async def renew_leases(self, instance_id: str, expires_at: int) -> None:
+        """Extend the lease on every unfinished task claimed by a process."""
+        await asyncio.to_thread(self._renew_leases_sync, instance_id, expires_at)
+
+    async def fail_claimed(self, instance_id: str, message: str) -> int:
+        """Fail the unfinished tasks of a process that is shutting down.
+
+        Queued jobs only live in that process's memory, so nothing else will
+        ever pick them up. Returns how many tasks changed.
+        """
+        return await asyncio.to_thread(
+            self._fail_unfinished_sync, message, instance_id, 0
+        )
+
+    async def fail_abandoned(self, message: str) -> int:
+        """Fail unfinished tasks whose lease expired; returns how many changed."""
+        return await asyncio.to_thread(
+            self._fail_unfinished_sync, message, None, _now_us()
+        )
+
+    def _create_sync(self, record: TaskRecord) -> TaskRecord:
+        with write_transaction() as conn:
+            conn.execute(
+                _SQL_INSERT_TASK,
+                (
+                    record.id,
+                    record.owner,
+                    record.filename,
+                    str(record.input_path),
+                    str(record.output_dir),
+                    record.status.value,
+                    record.created_at,
+                    record.updated_at,
+                    record.retention_days,
+                    record.progress,
+                    record.message,
+                    record.claimed_by,
+                    record.lease_expires,
+                ),
+            )
+            conn.execute(
+                _SQL_INSERT_PAYLOAD,
+                (record.id, _dumps(record.result) if record.result else None),
+            )
+            conn.executemany(
+                _SQL_INSERT_EVENT,
+                [(record.id, _dumps(event)) for event in record.events],
+            )
         return record
 
-    async def _fetch(self, task_id: str) -> TaskRecord:
-        with get_connection() as conn:
-            row = conn.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+    def _get_sync(self, task_id: str, with_events: bool = True) -> TaskRecord:
+        with get_connection(readonly=True) as conn:
+            row = conn.execute(_SQL_SELECT_TASK, (task_id, _now_us())).fetchone()
+            event_rows = (
+                conn.execute(_SQL_SELECT_EVENTS, (task_id,)).fetchall()
+                if row and with_events
+                else []
+            )
         if not row:
             raise KeyError(task_id)
-        record = self._row_to_record(row)
-        if _is_expired(record):
-            await self.delete(task_id)
+        events = [orjson.loads(event_row["event_json"]) for event_row in event_rows]
+        return self._row_to_record(row, events)
+
+    def _stamp_sync(self, task_id: str) -> tuple[str, int]:
+        with get_connection(readonly=True) as conn:
+            row = conn.execute(_SQL_SELECT_STAMP, (task_id, _now_us())).fetchone()
+        if not row:
             raise KeyError(task_id)
+        return row["owner"], row["updated_at"]
+
+    def _list_sync(self, owner: str, limit: int) -> list[TaskRecord]:
+        # Summaries never need the payloads, so task_payloads is not joined.
+        with get_connection(readonly=True) as conn:
+            rows = conn.execute(_SQL_LIST_TASKS, (owner, _now_us(), limit)).fetchall()
+        return [self._row_to_record(row) for row in rows]
+
+    def _update_sync(
+        self, task_id: str, changes: dict[str, Any], returning: bool
+    ) -> TaskRecord | None:
+        status_value = changes.get("status")
+        progress = changes.get("progress")
+        values = (
+            status_value.value if isinstance(status_value, TaskStatus) else None,
+            float(progress) if progress is not None else None,
+            changes.get("message"),
+            changes.get("retention_days"),
+        )
+        has_result = "result" in changes
+        if all(value is None for value in values) and not has_result:
+            return self._get_sync(task_id) if returning else None
+        _detail_cache.discard(task_id)
+        params = (*values, _now_us(), task_id)
+        result_json = None
+        if has_result and changes["result"] is not None:
+            result_json = _dumps(changes["result"])
+        with write_transaction() as conn:
+            if not returning:
+                conn.execute(_SQL_UPDATE_TASK, params)
+                if has_result:
+                    conn.execute(_SQL_UPSERT_RESULT, (task_id, result_json))
+                return None
+            row = conn.execute(_SQL_UPDATE_TASK_RETURNING, params).fetchone()
+            if row and has_result:
+                conn.execute(_SQL_UPSERT_RESULT, (task_id, result_json))
+            elif row:
+                payload = conn.execute(_SQL_SELECT_RESULT, (task_id,)).fetchone()
+                result_json = payload["result_json"] if payload else None
+        if not row:
+            raise KeyError(task_id)
+        record = self._row_to_record(row)
+        record.result = orjson.loads(result_json) if result_json else None
         return record
 
-    async def get(self, task_id: str) -> TaskRecord:
-        async with self._lock:
-            return await self._fetch(task_id)
-
-    async def list(self, owner: str, limit: int = 20) -> list[TaskRecord]:
-        async with self._lock:
-            with get_connection() as conn:
-                rows = conn.execute(
-                    "SELECT * FROM tasks WHERE owner = ? ORDER BY created_at DESC",
-                    (owner,),
-                ).fetchall()
-        records: list[TaskRecord] = []
-        for row in rows:
-            record = self._row_to_record(row)
-            if _is_expired(record):
-                await self.delete(record.id)
-                continue
-            records.append(record)
-            if len(records) >= limit:
-                break
-        return records
+    def _extend_events_sync(
+        self, task_id: str, encoded_events: list[str], progress: float | None
+    ) -> None:
+        _detail_cache.discard(task_id)
+        with write_transaction() as conn:
+            cursor = conn.execute(
+                _SQL_TOUCH_TASK,
+                (progress, _now_us(), task_id),
+            )
+            found = cursor.rowcount > 0
+            if found:
+                conn.executemany(
+                    _SQL_INSERT_EVENT,
+                    [(task_id, encoded) for encoded in encoded_events],
+                )
+                conn.execute(_SQL_TRIM_EVENTS, (task_id, task_id, _MAX_EVENTS))
+        if not found:
+            raise KeyError(task_id)
 
-    async def update(self, task_id: str, **kwargs: Any) -> TaskRecord:
-        async with self._lock:
-            fields: dict[str, Any] = {}
-            for key, value in kwargs.items():
-                if key == "status" and isinstance(value, TaskStatus):
-                    fields["status"] = value.value
-                elif key == "progress":
-                    fields["progress"] = float(value)
-                elif key == "message":
-                    fields["message"] = value
-                elif key == "result":
-                    fields["result_json"] = json.dumps(value) if value is not None else None
-                elif key == "retention_days":
-                    fields["retention_days"] = value
-            if not fields:
-                return await self._fetch(task_id)
-            fields["updated_at"] = datetime.utcnow().isoformat()
-            columns = ", ".join(f"{column} = ?" for column in fields)
-            values = list(fields.values()) + [task_id]
-            with get_connection() as conn:
-                conn.execute(f"UPDATE tasks SET {columns} WHERE id = ?", values)
-                conn.commit()
-            return await self._fetch(task_id)
+    def _delete_sync(self, task_id: str) -> None:
+        _detail_cache.discard(task_id)
+        with get_connection() as conn:
+            conn.execute(_SQL_DELETE_TASK, (task_id,))
+
+    def _delete_expired_sync(self) -> list[str]:
+        with write_transaction() as conn:
+            removed = [
+                row["id"] for row in conn.execute(_SQL_DELETE_EXPIRED, (_now_us(),))
+            ]
+        for task_id in removed:
+            _detail_cache.discard(task_id)
+        return removed
+
+    def _start_sync(self, task_id: str) -> bool:
+        _detail_cache.discard(task_id)
+        with get_connection() as conn:
+            cursor = conn.execute(_SQL_START_TASK, (_now_us(), task_id))
+        return cursor.rowcount > 0
 
-    async def append_event(self, task_id: str, event: dict[str, Any]) -> None:
-        sanitized = event
-        async with self._lock:
-            with get_connection() as conn:
-                row = conn.execute(
-                    "SELECT events_json FROM tasks WHERE id = ?",
-                    (task_id,),
-                ).fetchone()
-                if not row:
-                    raise KeyError(task_id)
-                events = json.loads(row["events_json"]) if row["events_json"] else []
-                events.append(sanitized)
-                conn.execute(
-                    "UPDATE tasks SET events_json = ?, updated_at = ? WHERE id = ?",
-                    (json.dumps(events), datetime.utcnow().isoformat(), task_id),
-                )
-                conn.commit()
+    def _renew_leases_sync(self, instance_id: str, expires_at: int) -> None:
+        with get_connection() as conn:
+            conn.execute(_SQL_RENEW_LEASES, (expires_at, instance_id))
 
-    async def delete(self, task_id: str) -> None:
-        async with self._lock:
-            with get_connection() as conn:
-                conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
-                conn.commit()
+    def _fail_unfinished_sync(
+        self, message: str, instance_id: str | None, expired_before: int
+    ) -> int:
+        params = (message, _now_us(), instance_id, expired_before)
+        with write_transaction() as conn:
+            failed = [row["id"] for row in conn.execute(_SQL_FAIL_UNFINISHED, params)]
+        for task_id in failed:
+            _detail_cache.discard(task_id)
+        return len(failed)
 
 
 class InvalidConfigError(Exception):
     """Raised when user supplied overrides fail validation."""
 
 
-def _jsonify(value: Any) -> Any:
-    if isinstance(value, (str, int, float, bool)) or value is None:
-        return value
-    if isinstance(value, Path):
-        return str(value)
-    if isinstance(value, datetime):
-        return value.isoformat()
-    if isinstance(value, dict):
-        return {k: _jsonify(v) for k, v in value.items()}
-    if isinstance(value, (list, tuple, set)):
-        return [_jsonify(v) for v in value]
-    return str(value)
+# Output key -> attribute on BabelDOC's translate result.
+_RESULT_FIELDS = (
+    ("original_pdf", "original_pdf_path"),
+    ("mono_pdf", "mono_pdf_path"),
+    ("dual_pdf", "dual_pdf_path"),
+    ("output_dir", "output_dir"),
+)
 
 
 def _extract_result(result: Any) -> dict[str, str | None] | None:
     if result is None:
         return None
     try:
-        return {
-            "original_pdf": (
-                str(getattr(result, "original_pdf_path"))
-                if getattr(result, "original_pdf_path", None)
-                else None
-            ),
-            "mono_pdf": (
-                str(getattr(result, "mono_pdf_path"))
-                if getattr(result, "mono_pdf_path", None)
-                else None
-            ),
-            "dual_pdf": (
-                str(getattr(result, "dual_pdf_path"))
-                if getattr(result, "dual_pdf_path", None)
-                else None
-            ),
-            "output_dir": (
-                str(getattr(result, "output_dir"))
-                if getattr(result, "output_dir", None)
-                else None
-            ),
-        }
+        extracted: dict[str, str | None] = {}
+        for key, attr in _RESULT_FIELDS:
+            value = getattr(result, attr, None)
+            extracted[key] = str(value) if value else None
+        return extracted
     except Exception:  # pragma: no cover - defensive fallback
         logger.debug("Unable to extract translate_result payload", exc_info=True)
         return None
 
 
 def _sanitize_event(event: dict[str, Any]) -> dict[str, Any]:
-    sanitized: dict[str, Any] = {}
-    for key, value in event.items():
-        if key == "translate_result":
-            sanitized[key] = _extract_result(value)
-        else:
-            sanitized[key] = _jsonify(value)
-    return sanitized
+    # Everything else is converted when the event is serialized by _dumps.
+    if "translate_result" in event:
+        return {**event, "translate_result": _extract_result(event["translate_result"])}
+    return event
+
+
+def _is_pdf_name(name: str | None) -> bool:
+    # Only the suffix needs case-folding, not the whole name.
+    return (name or "")[-4:].lower() == ".pdf"
+
+
+def _copy_upload(source: BinaryIO, target: Path) -> None:
+    with target.open("wb") as buffer:
+        # Once the spool has rolled over to a real temp file, let the kernel
+        # copy it; sendfile() between regular files is Linux-only. Checking
+        # fileno() instead would force an in-memory spool to disk.
+        if sys.platform == "linux" and getattr(source, "_rolled", False):
+            source.flush()
+            _sendfile_all(source.fileno(), buffer.fileno())
+            return
+        shutil.copyfileobj(source, buffer, _UPLOAD_CHUNK_SIZE)
+
+
+def _sendfile_all(source_fd: int, target_fd: int) -> None:
+    size = os.fstat(source_fd).st_size
+    offset = 0
+    while offset < size:
+        sent = os.sendfile(target_fd, source_fd, offset, size - offset)
+        if sent == 0:
+            break
+        offset += sent
+
+
+# Defaults only depend on the process environment, so compute them once.
+_BASE_CLI = CLIEnvSettingsModel()
+_BASE_CLI_DICT = _BASE_CLI.model_dump(mode="python")
+
+
+@functools.lru_cache(maxsize=256)
+def _settings_for_overrides(overrides_key: bytes) -> SettingsModel:
+    """Merge and validate overrides (as sorted-key JSON) over the defaults."""
+    overrides = orjson.loads(overrides_key)
+    if not overrides:
+        # Nothing to merge, so the defaults need no second validation pass.
+        return _BASE_CLI.to_settings_model()
+    # merge_settings merges nested dicts in place; keep the base intact.
+    merged_dict = ConfigManager().merge_settings(
+        [overrides, copy.deepcopy(_BASE_CLI_DICT)]
+    )
+    try:
+        cli_model = ConfigManager()._build_model_from_args(
+            CLIEnvSettingsModel, merged_dict
+        )
+    except ValidationError as exc:
+        raise InvalidConfigError(exc.errors()) from exc
+    return cli_model.to_settings_model()
+
+
+class _ZipSink(io.RawIOBase):
+    """Unseekable write target that hands zipfile output back in chunks."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _iter_archive(root: Path) -> Iterator[bytes]:
+    """Yield a zip of ``root`` as it is built, without a temporary file.
+
+    PDFs are already compressed, so entries are stored rather than deflated.
+    Starlette runs sync iterators in its threadpool, keeping file reads off
+    the event loop.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+        for path in sorted(root.rglob("*")):
+            if not path.is_file():
+                continue
+            info = zipfile.ZipInfo.from_file(path, path.relative_to(root).as_posix())
+            force_zip64 = info.file_size >= zipfile.ZIP64_LIMIT
+            with (
+                path.open("rb") as source,
+                archive.open(info, "w", force_zip64=force_zip64) as target,
+            ):
+                while chunk := source.read(_ARCHIVE_CHUNK_SIZE):
+                    target.write(chunk)
+                    if data := sink.drain():
+                        yield data
+            if data := sink.drain():
+                yield data
+    if data := sink.drain():
+        yield data
+
+
+def _newest_mtime_ns(root: Path) -> int:
+    """Latest mtime under ``root``, including the directory itself."""
+    newest = root.stat().st_mtime_ns
+    for path in root.rglob("*"):
+        newest = max(newest, path.stat().st_mtime_ns)
+    return newest
+
+
+def _not_modified_since(header: str | None, mtime: float) -> bool:
+    if not header:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates have one-second resolution.
+    return int(mtime) <= since.timestamp()
+
+
+class _EventBuffer:
+    """Collects streamed events so they reach storage in batches.
+
+    Between :meth:`start` and :meth:`close` a background task also flushes
+    on the interval, so progress stays fresh while the stream is quiet.
+    """
+
+    def __init__(self, storage: TaskStorage, task_id: str) -> None:
+        self._storage = storage
+        self._task_id = task_id
+        self._events: list[str] = []
+        self._progress: float | None = None
+        self._last_flush = time.monotonic()
+        self._flush_lock = asyncio.Lock()
+        self._closed = asyncio.Event()
+        self._flusher: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def close(self) -> None:
+        """Stop the background flusher and write whatever is still pending.
+
+        Never raises for storage errors, so callers can always go on to record
+        the task's final status.
+        """
+        self._closed.set()
+        if self._flusher is not None:
+            flusher, self._flusher = self._flusher, None
+            await flusher
+        await self.flush()
+
+    async def _flush_periodically(self) -> None:
+        while not self._closed.is_set():
+            remaining = self._last_flush + _EVENT_BATCH_INTERVAL - time.monotonic()
+            try:
+                await asyncio.wait_for(self._closed.wait(), timeout=max(0.0, remaining))
+            except asyncio.TimeoutError:
+                if time.monotonic() - self._last_flush >= _EVENT_BATCH_INTERVAL:
+                    await self.flush()
+
+    def add(self, event: dict[str, Any], progress: float | None) -> None:
+        # Encode on arrival: it snapshots the event, which the pipeline may
+        # keep mutating, and leaves no per-event work for the flush.
+        self._events.append(_dumps(event))
+        if progress is not None:
+            self._progress = progress
+
+    def due(self) -> bool:
+        return (
+            len(self._events) >= _EVENT_BATCH_SIZE
+            or time.monotonic() - self._last_flush >= _EVENT_BATCH_INTERVAL
+        )
+
+    async def flush(self) -> None:
+        """Write pending events; on failure keep them for the next attempt."""
+        # Serialised so batches from the flusher and the stream loop reach
+        # storage in the order they were collected.
+        async with self._flush_lock:
+            events, progress = self._events, self._progress
+            self._events = []
+            self._progress = None
+            self._last_flush = time.monotonic()
+            if not events and progress is None:
+                return
+            try:
+                await self._storage.extend_events(
+                    self._task_id, events, progress=progress
+                )
+            except KeyError:
+                # The task was deleted while running; nothing to write to.
+                pass
+            except Exception:
+                logger.warning(
+                    "Failed to store %d event(s) for task %s; will retry",
+                    len(events),
+                    self._task_id,
+                    exc_info=True,
+                )
+                self._events[:0] = events
+                if self._progress is None:
+                    self._progress = progress
 
 
 class TranslationService:
@@ -343,15 +824,71 @@ class TranslationService:
     def __init__(self, storage: TaskStorage, workspace: Path) -> None:
         self._storage = storage
         self._workspace = workspace
-        self._config_manager = ConfigManager()
         self._workspace.mkdir(parents=True, exist_ok=True)
+        # Jobs wait here (status PENDING) until one of the workers is free.
+        self._queue: asyncio.Queue[tuple[str, SettingsModel, Path]] = asyncio.Queue()
+        self._workers: list[asyncio.Task] = []
+        # Tasks queued here are claimed under this id, which is unique to the
+        # process, so other API processes sharing the database leave them alone.
+        self.instance_id = secrets.token_hex(8)
+
+    def start(self, workers: int) -> None:
+        """Start ``workers`` coroutines that run queued translations."""
+        for _ in range(max(1, workers)):
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def stop(self) -> None:
+        """Cancel the workers and fail every task this process still holds."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+        interrupted = await self._storage.fail_claimed(
+            self.instance_id, "Interrupted by server shutdown"
+        )
+        if interrupted:
+            logger.warning("Marked %d interrupted task(s) as failed", interrupted)
+
+    async def renew_leases(self) -> None:
+        await self._storage.renew_leases(self.instance_id, _now_us() + _LEASE_TTL_US)
+
+    async def _worker(self) -> None:
+        while True:
+            task_id, settings, input_path = await self._queue.get()
+            try:
+                await self._run_task(task_id, settings, input_path)
+            except Exception:  # pragma: no cover - keep the worker alive
+                logger.exception("Worker failed while running task %s", task_id)
+            finally:
+                self._queue.task_done()
 
     async def submit(
         self, upload: UploadFile, overrides: dict[str, Any], user: User
     ) -> TaskRecord:
-        task_id = uuid.uuid4().hex
-        safe_name = Path(upload.filename or f"{task_id}.pdf").name
-        if not safe_name.lower().endswith(".pdf"):
+        save = functools.partial(self._save_upload, upload)
+        return await self._submit(upload.filename, save, overrides, user)
+
+    async def submit_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        filename: str | None,
+        overrides: dict[str, Any],
+        user: User,
+    ) -> TaskRecord:
+        """Like :meth:`submit`, writing a raw request body straight to disk."""
+        save = functools.partial(self._save_stream, chunks)
+        return await self._submit(filename, save, overrides, user)
+
+    async def _submit(
+        self,
+        filename: str | None,
+        save: Callable[[Path], Awaitable[None]],
+        overrides: dict[str, Any],
+        user: User,
+    ) -> TaskRecord:
+        task_id = secrets.token_hex(16)
+        safe_name = Path(filename or f"{task_id}.pdf").name
+        if not _is_pdf_name(safe_name):
             safe_name += ".pdf"
 
         task_dir = self._workspace / task_id
@@ -361,8 +898,9 @@ class TranslationService:
         output_dir.mkdir(parents=True, exist_ok=True)
 
         input_path = input_dir / safe_name
-        await self._save_upload(upload, input_path)
+        await save(input_path)
 
+        now = _now_us()
         record = TaskRecord(
             id=task_id,
             owner=user.username,
@@ -371,50 +909,63 @@ class TranslationService:
             input_path=input_path,
             output_dir=output_dir,
             status=TaskStatus.PENDING,
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow(),
+            created_at=now,
+            updated_at=now,
+            claimed_by=self.instance_id,
+            lease_expires=now + _LEASE_TTL_US,
         )
         await self._storage.create(record)
 
         try:
             settings = self._build_settings(overrides, output_dir)
         except InvalidConfigError as exc:  # validation error
-            await self._storage.update(
+            await self._storage.update_fields(
                 task_id,
                 status=TaskStatus.FAILED,
                 message=str(exc),
             )
             raise
 
-        asyncio.create_task(self._run_task(task_id, settings, input_path))
+        self._queue.put_nowait((task_id, settings, input_path))
         return record
 
+    async def remove_task_files(self, task_ids: list[str]) -> None:
+        """Delete the workspace directories of the given tasks."""
+        await asyncio.to_thread(self._remove_task_files_sync, task_ids)
+
+    def _remove_task_files_sync(self, task_ids: list[str]) -> None:
+        for task_id in task_ids:
+            shutil.rmtree(self._workspace / task_id, ignore_errors=True)
+
     async def _save_upload(self, upload: UploadFile, target: Path) -> None:
-        with target.open("wb") as buffer:
-            while True:
-                chunk = await upload.read(1024 * 1024)
-                if not chunk:
-                    break
-                buffer.write(chunk)
+        # Starlette has already spooled the body; copy it off the event loop.
+        await upload.seek(0)
+        await asyncio.to_thread(_copy_upload, upload.file, target)
         await upload.seek(0)
 
+    async def _save_stream(self, chunks: AsyncIterator[bytes], target: Path) -> None:
+        # Network chunks are small; gather them so each threaded write is ~1 MiB.
+        buffer = await asyncio.to_thread(target.open, "wb")
+        try:
+            pending = bytearray()
+            async for chunk in chunks:
+                pending += chunk
+                if len(pending) >= _UPLOAD_CHUNK_SIZE:
+                    await asyncio.to_thread(buffer.write, pending)
+                    pending = bytearray()
+            if pending:
+                await asyncio.to_thread(buffer.write, pending)
+        finally:
+            await asyncio.to_thread(buffer.close)
+
     def _build_settings(
         self, overrides: dict[str, Any], output_dir: Path
     ) -> SettingsModel:
-        base_cli = CLIEnvSettingsModel()
-        base_dict = base_cli.model_dump(mode="python")
-        merged_dict = base_dict
-        if overrides:
-            if not isinstance(overrides, dict):
-                raise InvalidConfigError("config must be a JSON object")
-            merged_dict = self._config_manager.merge_settings([overrides, base_dict])
-        try:
-            cli_model = self._config_manager._build_model_from_args(
-                CLIEnvSettingsModel, merged_dict
-            )
-        except ValidationError as exc:
-            raise InvalidConfigError(exc.errors()) from exc
-        settings = cli_model.to_settings_model()
+        if overrides and not isinstance(overrides, dict):
+            raise InvalidConfigError("config must be a JSON object")
+        overrides_key = orjson.dumps(overrides or {}, option=orjson.OPT_SORT_KEYS)
+        # The cached model is shared, so every task gets its own deep copy.
+        settings = _settings_for_overrides(overrides_key).model_copy(deep=True)
         settings.basic.gui = False
         settings.basic.debug = False
         settings.translation.output = str(output_dir)
@@ -423,28 +974,47 @@ class TranslationService:
     async def _run_task(
         self, task_id: str, settings, input_path: Path
     ) -> None:  # pragma: no cover - background task
-        await self._storage.update(task_id, status=TaskStatus.RUNNING)
+        if not await self._storage.start(task_id):
+            # Failed or deleted while it waited in the queue.
+            logger.info("Skipping task %s: no longer pending", task_id)
+            return
+        # A stream that ends without a finish event still counts as done.
+        changes: dict[str, Any] = {
+            "status": TaskStatus.DONE,
+            "progress": 1.0,
+            "message": "Completed",
+        }
+        buffer = _EventBuffer(self._storage, task_id)
+        buffer.start()
         try:
             async for event in do_translate_async_stream(settings, input_path):
-                sanitized = _sanitize_event(event)
-                await self._storage.append_event(task_id, sanitized)
-
-                if isinstance(event.get("progress"), (int, float)):
-                    await self._storage.update(
-                        task_id, progress=float(event["progress"])
-                    )
+                progress = event.get("progress")
+                buffer.add(
+                    _sanitize_event(event),
+                    float(progress) if isinstance(progress, (int, float)) else None,
+                )
 
                 event_type = event.get("type")
+                if buffer.due():
+                    await buffer.flush()
                 if event_type == "finish":
                     result_data = _extract_result(event.get("translate_result"))
                     # Optional: linearize PDFs for faster web view
                     try:
                         if settings.pdf.linearize_output and result_data:
-                            for key in ("mono_pdf", "dual_pdf", "original_pdf"):
-                                pdf_path = result_data.get(key)
-                                if not pdf_path:
-                                    continue
-                                _try_linearize_pdf(Path(pdf_path))
+                            pdf_paths = [
+                                result_data.get(key)
+                                for key in ("mono_pdf", "dual_pdf", "original_pdf")
+                            ]
+                            await asyncio.gather(
+                                *(
+                                    asyncio.to_thread(
+                                        _try_linearize_pdf, Path(pdf_path)
+                                    )
+                                    for pdf_path in pdf_paths
+                                    if pdf_path
+                                )
+                            )
                     except Exception:
                         logger.debug("linearize step skipped", exc_info=True)
                     # Ensure output_dir is always available to the client
@@ -458,40 +1028,23 @@ class TranslationService:
                         result_data.setdefault("output_dir", output_dir_value)
                     elif output_dir_value:
                         result_data = {"output_dir": output_dir_value}
-                    await self._storage.update(
-                        task_id,
-                        status=TaskStatus.DONE,
-                        progress=1.0,
-                        message="Completed",
-                        result=result_data,
-                    )
-                    return
+                    changes["result"] = result_data
+                    break
                 if event_type == "error":
                     message = str(event.get("error", "Translation failed"))
-                    await self._storage.update(
-                        task_id,
-                        status=TaskStatus.FAILED,
-                        message=message,
-                    )
-                    return
-
-            # fallback when stream ends without finish event
-            await self._storage.update(
-                task_id,
-                status=TaskStatus.DONE,
-                progress=1.0,
-                message="Completed",
-            )
+                    changes = {"status": TaskStatus.FAILED, "message": message}
+                    break
         except TranslationError as exc:
             logger.error("Translation error for task %s: %s", task_id, exc)
-            await self._storage.update(
-                task_id, status=TaskStatus.FAILED, message=str(exc)
-            )
+            changes = {"status": TaskStatus.FAILED, "message": str(exc)}
         except Exception as exc:  # pragma: no cover - defensive logging
             logger.exception("Unexpected error running task %s", task_id)
-            await self._storage.update(
-                task_id, status=TaskStatus.FAILED, message=str(exc)
-            )
+            changes = {"status": TaskStatus.FAILED, "message": str(exc)}
+        finally:
+            # Events are written before the final status; close() swallows
+            # storage errors, so the status update below always runs.
+            await buffer.close()
+        await self._storage.update_fields(task_id, **changes)
 
 
 def _parse_config(raw: str | None) -> dict[str, Any]:
@@ -512,29 +1065,102 @@ def _parse_config(raw: str | None) -> dict[str, Any]:
     return parsed
 
 
-def _serialize_summary(record: TaskRecord) -> TaskSummaryModel:
-    return TaskSummaryModel.model_validate(record)
+def _summaries_json(records: list[TaskRecord]) -> bytes:
+    """Encode TaskSummaryModel-shaped JSON for ``records`` with orjson."""
+    return orjson.dumps(
+        [
+            {
+                "id": record.id,
+                "filename": record.filename,
+                "status": record.status,
+                "progress": record.progress,
+                "message": record.message,
+                "created_at": _from_us(record.created_at),
+                "updated_at": _from_us(record.updated_at),
+            }
+            for record in records
+        ],
+        option=orjson.OPT_UTC_Z,
+    )
 
 
+# TaskRecord fields already have the right types, so the detail is built with
+# model_construct and skips validation.
 def _serialize_detail(record: TaskRecord) -> TaskDetailModel:
-    detail = TaskDetailModel.model_validate(record)
+    result = None
     if record.result:
-        result_data = dict(record.result)
+        result = TaskResultModel.model_construct(**record.result)
         # Backfill output_dir for older records that don't have it in result
-        if not result_data.get("output_dir"):
-            result_data["output_dir"] = str(record.output_dir)
-        detail.result = TaskResultModel.model_validate(result_data)
-    return detail
+        if not result.output_dir:
+            result.output_dir = str(record.output_dir)
+    return TaskDetailModel.model_construct(
+        id=record.id,
+        filename=record.filename,
+        status=record.status,
+        progress=record.progress,
+        message=record.message,
+        created_at=_from_us(record.created_at),
+        updated_at=_from_us(record.updated_at),
+        events=record.events,
+        result=result,
+    )
 
 
-TASK_WORKSPACE = Path(tempfile.gettempdir()) / "pdfmathtranslate-api-tasks"
+# Task files live next to the persistent task table when P2Z_TASK_WORKSPACE is
+# set, so outputs survive restarts. The reaper removes them once tasks expire.
+TASK_WORKSPACE = Path(
+    os.environ.get("P2Z_TASK_WORKSPACE")
+    or Path(tempfile.gettempdir()) / "pdfmathtranslate-api-tasks"
+).expanduser()
+# Number of translations run at once (env P2Z_TRANSLATE_WORKERS); the rest queue.
+_TRANSLATE_WORKERS = _env_int("P2Z_TRANSLATE_WORKERS", 1)
 storage = TaskStorage()
 service = TranslationService(storage=storage, workspace=TASK_WORKSPACE)
 
+
+async def _reap_expired_tasks() -> None:
+    while True:
+        # Renew first, so this process never sees its own leases as expired.
+        try:
+            await service.renew_leases()
+            abandoned = await storage.fail_abandoned(
+                "Interrupted: the server running this task stopped"
+            )
+            if abandoned:
+                logger.warning("Marked %d abandoned task(s) as failed", abandoned)
+        except Exception:
+            logger.exception("Failed to maintain task leases")
+        try:
+            removed = await storage.delete_expired()
+            if removed:
+                await service.remove_task_files(removed)
+                logger.info("Removed %d expired tasks", len(removed))
+        except Exception:
+            logger.exception("Failed to remove expired tasks")
+        await asyncio.sleep(_REAP_INTERVAL)
+
+
+@asynccontextmanager
+async def _lifespan(_app: FastAPI):
+    init_db()
+    # Warm the settings cache for the common no-overrides submit.
+    await asyncio.to_thread(_settings_for_overrides, orjson.dumps({}))
+    service.start(_TRANSLATE_WORKERS)
+    reaper = asyncio.create_task(_reap_expired_tasks())
+    try:
+        yield
+    finally:
+        await service.stop()
+        reaper.cancel()
+        with suppress(asyncio.CancelledError):
+            await reaper
+
+
 app = FastAPI(
     title="PDFMathTranslate API",
     version=__version__,
     description="HTTP API wrapper for PDFMathTranslate translation pipeline.",
+    lifespan=_lifespan,
 )
 
 # Enable CORS (configurable via env P2Z_CORS_ORIGINS, comma-separated). Defaults to allow all.
@@ -554,28 +1180,43 @@ app.add_middleware(
 
 
 # Optional linearization (Fast Web View) helpers
-def _try_linearize_pdf(path: Path) -> None:
-    if not path or not path.exists():
-        return
-    # Try pikepdf first
+@functools.lru_cache(maxsize=1)
+def _pikepdf():
     try:
         import pikepdf  # type: ignore
+    except ImportError:
+        return None
+    return pikepdf
 
-        tmp_path = path.with_suffix(path.suffix + ".lin.pdf")
-        with pikepdf.open(str(path)) as pdf:
-            pdf.save(str(tmp_path), linearize=True)
-        tmp_path.replace(path)
-        logger.info("Linearized PDF via pikepdf: %s", path)
-        return
-    except Exception:
-        logger.debug("pikepdf not available or failed; will try qpdf if present", exc_info=True)
 
-    # Fallback to qpdf CLI if available
-    if shutil.which("qpdf"):
+@functools.lru_cache(maxsize=1)
+def _qpdf_path() -> str | None:
+    return shutil.which("qpdf")
+
+
+def _try_linearize_pdf(path: Path) -> None:
+    if not path or not path.exists():
+        return
+    # Try pikepdf first
+    pikepdf = _pikepdf()
+    if pikepdf is not None:
         try:
             tmp_path = path.with_suffix(path.suffix + ".lin.pdf")
-            subprocess.run(["qpdf", "--linearize", str(path), str(tmp_path)], check=True)
+            with pikepdf.open(str(path)) as pdf:
+                pdf.save(str(tmp_path), linearize=True)
             tmp_path.replace(path)
+            logger.info("Linearized PDF via pikepdf: %s", path)
+            return
+        except Exception:
+            logger.debug("pikepdf linearize failed; will try qpdf if present", exc_info=True)
+
+    # Fallback to qpdf CLI if available
+    qpdf = _qpdf_path()
+    if qpdf:
+        try:
+            subprocess.run(
+                [qpdf, "--linearize", "--replace-input", str(path)], check=True
+            )
             logger.info("Linearized PDF via qpdf: %s", path)
         except Exception:
             logger.debug("qpdf linearize failed", exc_info=True)
@@ -617,8 +1258,8 @@ async def create_task(
     file: UploadFile = File(...),
     config: str | None = Form(None),
     user: User = Depends(get_user_or_guest),
-) -> TaskDetailModel:
-    if not (file.filename or "").lower().endswith(".pdf"):
+) -> Response:
+    if not _is_pdf_name(file.filename):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Only PDF files are supported.",
@@ -630,30 +1271,100 @@ async def create_task(
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)
         ) from exc
-    return _serialize_detail(record)
+    # Returning the model would make FastAPI validate it again against
+    # response_model; serialize it directly instead.
+    return Response(
+        content=_serialize_detail(record).model_dump_json(),
+        status_code=status.HTTP_201_CREATED,
+        media_type="application/json",
+    )
+
+
+@app.post(
+    "/api/tasks/raw",
+    response_model=TaskDetailModel,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_task_raw(
+    request: Request,
+    filename: str | None = None,
+    config: str | None = None,
+    user: User = Depends(get_user_or_guest),
+) -> Response:
+    """Create a task from an ``application/pdf`` request body.
+
+    Skips multipart parsing and its temporary spool; ``filename`` and the JSON
+    ``config`` overrides come from the query string.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.split(";", 1)[0].strip().lower() != "application/pdf":
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Body must be application/pdf.",
+        )
+    overrides = _parse_config(config)
+    try:
+        record = await service.submit_stream(
+            request.stream(), filename, overrides, user=user
+        )
+    except InvalidConfigError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)
+        ) from exc
+    return Response(
+        content=_serialize_detail(record).model_dump_json(),
+        status_code=status.HTTP_201_CREATED,
+        media_type="application/json",
+    )
 
 
 @app.get("/api/tasks", response_model=list[TaskSummaryModel])
 async def list_tasks(
     limit: int = 20, user: User = Depends(get_user_or_guest)
-) -> list[TaskSummaryModel]:
+) -> Response:
     limit = max(1, min(limit, 100))
     records = await storage.list(owner=user.username, limit=limit)
-    return [_serialize_summary(record) for record in records]
+    return Response(content=_summaries_json(records), media_type="application/json")
+
+
+def _detail_etag(task_id: str, updated_at: int) -> str:
+    return f'"{task_id}-{updated_at}"'
 
 
 @app.get("/api/tasks/{task_id}", response_model=TaskDetailModel)
-async def get_task(task_id: str, user: User = Depends(get_user_or_guest)) -> TaskDetailModel:
+async def get_task(
+    task_id: str,
+    user: User = Depends(get_user_or_guest),
+    if_none_match: str | None = Header(None),
+) -> Response:
+    # Polling hits this often; answer from the owner/updated_at stamp when the
+    # task has not changed instead of reloading and re-serializing it.
     try:
-        record = await storage.get(task_id)
+        owner, updated_at = await storage.stamp(task_id)
     except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Not found"
+        ) from None
+    if owner != user.username:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
-    if record.owner != user.username:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
-    if _is_expired(record):
-        await storage.delete(task_id)
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
-    return _serialize_detail(record)
+    etag = _detail_etag(task_id, updated_at)
+    if if_none_match == etag:
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    body = _detail_cache.get(task_id, updated_at)
+    if body is None:
+        try:
+            record = await storage.get(task_id)
+        except KeyError:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Not found"
+            ) from None
+        updated_at = record.updated_at
+        etag = _detail_etag(task_id, updated_at)
+        body = _serialize_detail(record).model_dump_json().encode()
+        _detail_cache.put(task_id, updated_at, body)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 
 @app.get("/api/tasks/{task_id}/result")
@@ -665,36 +1376,31 @@ async def download_result(
     user: User = Depends(get_user_or_guest),
 ):
     try:
-        record = await storage.get(task_id)
+        record = await storage.get(task_id, with_events=False)
     except KeyError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
     if record.owner != user.username:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
-    if _is_expired(record):
-        await storage.delete(task_id)
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
     if not record.result:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Result not available yet.",
         )
-    key = {
-        ResultMode.mono: "mono_pdf",
-        ResultMode.dual: "dual_pdf",
-        ResultMode.original: "original_pdf",
-    }[mode]
-    result_path = record.result.get(key)
+    result_path = record.result.get(_MODE_KEY[mode])
     if not result_path:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"{mode.value} PDF not available.",
         )
     path = Path(result_path)
-    if not path.exists():
+    # One stat serves both the existence check and FileResponse's headers.
+    try:
+        stat_result = path.stat()
+    except OSError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="File missing on server.",
-        )
+        ) from None
     if str(format).lower() == "base64":
         import base64
         data = base64.b64encode(path.read_bytes()).decode("ascii")
@@ -706,31 +1412,31 @@ async def download_result(
             }
         )
     else:
-        response = FileResponse(
+        # Previews use "inline" so the browser renders instead of downloading
+        return FileResponse(
             path,
             media_type="application/pdf",
             filename=path.name,
+            stat_result=stat_result,
+            content_disposition_type=(
+                "inline" if str(disposition).lower() == "inline" else "attachment"
+            ),
         )
-        # For preview, avoid setting Content-Disposition so download managers won't hijack
-        if str(disposition).lower() != "inline":
-            response.headers["Content-Disposition"] = f'attachment; filename="{path.name}"'
-        return response
 
 
 @app.get("/api/tasks/{task_id}/archive")
 async def download_archive(
     task_id: str,
     user: User = Depends(get_user_or_guest),
+    if_none_match: str | None = Header(None),
+    if_modified_since: str | None = Header(None),
 ):
     try:
-        record = await storage.get(task_id)
+        record = await storage.get(task_id, with_events=False)
     except KeyError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
     if record.owner != user.username:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
-    if _is_expired(record):
-        await storage.delete(task_id)
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
     if not record.result:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -751,18 +1457,24 @@ async def download_archive(
             detail="Output directory missing on server.",
         )
 
-    task_dir = output_dir.parent
-    zip_base = task_dir / "package"
-    zip_path = Path(shutil.make_archive(str(zip_base), "zip", root_dir=str(output_dir)))
-    if not zip_path.exists():
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to create archive.",
-        )
-    return FileResponse(
-        zip_path,
+    mtime_ns = await asyncio.to_thread(_newest_mtime_ns, output_dir)
+    mtime = mtime_ns / 1_000_000_000
+    headers = {
+        "ETag": f'"{task_id}-{mtime_ns}"',
+        "Last-Modified": formatdate(mtime, usegmt=True),
+    }
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110).
+    if if_none_match is not None:
+        not_modified = if_none_match == headers["ETag"]
+    else:
+        not_modified = _not_modified_since(if_modified_since, mtime)
+    if not_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    headers["Content-Disposition"] = f'attachment; filename="{task_id}.zip"'
+    return StreamingResponse(
+        _iter_archive(output_dir),
         media_type="application/zip",
-        filename=f"{task_id}.zip",
+        headers=headers,
     )
 
 
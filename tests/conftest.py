@@ -0,0 +1,21 @@
+from collections.abc import Generator
+from pathlib import Path
+
+import pytest
+from pdf2zh_next import db
+
+
+@pytest.fixture
+def db_path(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> Generator[Path, None, None]:
+    """Point the db module at a fresh file with its own pools"""
+    path = tmp_path / "pdf2zh.db"
+    monkeypatch.setenv("PDF2ZH_DB_PATH", str(path))
+    monkeypatch.setattr(db, "_INITIALIZED", False)
+    monkeypatch.setattr(db, "_WAL_ENABLED", False)
+    monkeypatch.setattr(db, "_READ_POOL", db._ConnectionPool(2, readonly=True))
+    monkeypatch.setattr(db, "_WRITE_POOL", db._ConnectionPool(1, readonly=False))
+    db._get_db_path.cache_clear()
+    yield path
+    db._get_db_path.cache_clear()
@@ -0,0 +1,74 @@
+from collections import OrderedDict
+from pathlib import Path
+
+import pytest
+from pdf2zh_next import auth
+from pdf2zh_next.auth import _hash_password
+from pdf2zh_next.auth import _verify_password
+
+
+class TestPasswordHashing:
+    def test_round_trip(self):
+        """Test a freshly hashed password verifies and others do not"""
+        hashed = _hash_password("s3cret")
+        assert _verify_password("s3cret", hashed)
+        assert not _verify_password("wrong", hashed)
+
+    def test_passlib_hashes_verify(self):
+        """Test hashes written by passlib's pbkdf2_sha256 still verify"""
+        pbkdf2_sha256 = pytest.importorskip("passlib.hash").pbkdf2_sha256
+        for rounds in (29000, 1000):
+            hashed = pbkdf2_sha256.using(rounds=rounds).hash("s3cret")
+            assert _verify_password("s3cret", hashed)
+            assert not _verify_password("wrong", hashed)
+
+    def test_hashes_readable_by_passlib(self):
+        """Test our hashes verify with passlib's pbkdf2_sha256"""
+        pbkdf2_sha256 = pytest.importorskip("passlib.hash").pbkdf2_sha256
+        assert pbkdf2_sha256.verify("s3cret", _hash_password("s3cret"))
+
+    @pytest.mark.parametrize(
+        "hashed",
+        [
+            "",
+            "plaintext",
+            "$2b$12$abcdefghijklmnopqrstuuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ01",
+            "$pbkdf2-sha256$",
+            "$pbkdf2-sha256$29000$c2FsdA",
+            "$pbkdf2-sha256$many$c2FsdA$c2FsdA",
+            "$pbkdf2-sha256$29000$c2FsdA$c2FsdA$extra",
+            "$pbkdf2-sha256$29000$sält$c2FsdA",
+            "$pbkdf2-sha256$29000$c2FsdA$!!!",
+        ],
+    )
+    def test_malformed_hashes_rejected(self, hashed: str):
+        """Test malformed or foreign hash strings never verify"""
+        assert not _verify_password("s3cret", hashed)
+
+
+class TestTokenCache:
+    @pytest.fixture(autouse=True)
+    def empty_cache(self, db_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(auth, "_TOKEN_CACHE", OrderedDict())
+
+    def test_register_caches_token(self):
+        """Test the token minted at registration resolves from the cache"""
+        user, token = auth.register_user("alice", "s3cret")
+        assert token in auth._TOKEN_CACHE
+        assert auth.get_user_by_token(token) == user
+
+    def test_login_invalidates_previous_token(self):
+        """Test logging in again drops the old token from cache and database"""
+        _, old_token = auth.register_user("alice", "s3cret")
+        assert auth.get_user_by_token(old_token) is not None
+        user, new_token = auth.authenticate_user("alice", "s3cret")
+        assert old_token not in auth._TOKEN_CACHE
+        assert auth.get_user_by_token(old_token) is None
+        assert auth.get_user_by_token(new_token) == user
+
+    def test_lookup_populates_cache(self):
+        """Test a cache miss is answered from the database and then cached"""
+        user, token = auth.register_user("alice", "s3cret")
+        auth._TOKEN_CACHE.clear()
+        assert auth.get_user_by_token(token) == user
+        assert token in auth._TOKEN_CACHE
@@ -0,0 +1,185 @@
+import sqlite3
+import threading
+from datetime import datetime
+from datetime import timezone
+from pathlib import Path
+
+import orjson
+import pytest
+from pdf2zh_next import db
+
+# Schema as written by releases that stored timestamps as isoformat() text and
+# kept result/events JSON inline on the task row.
+LEGACY_TASKS_SCHEMA = """
+CREATE TABLE tasks (
+    id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    input_path TEXT NOT NULL,
+    output_dir TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    retention_days INTEGER,
+    progress REAL DEFAULT 0,
+    message TEXT,
+    result_json TEXT,
+    events_json TEXT
+)
+"""
+
+
+def _micros(value: str) -> int:
+    parsed = datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp()) * 1_000_000 + parsed.microsecond
+
+
+class TestLegacyMigration:
+    @pytest.fixture
+    def legacy_db(self, db_path: Path) -> Path:
+        conn = sqlite3.connect(db_path)
+        conn.execute(LEGACY_TASKS_SCHEMA)
+        conn.executemany(
+            "INSERT INTO tasks VALUES (?, 'alice', 'a.pdf', '/in', '/out', ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    "t1",
+                    "DONE",
+                    "2024-01-01T00:00:00.123456",
+                    "2024-01-02T03:04:05",
+                    7,
+                    1.0,
+                    "Completed",
+                    orjson.dumps({"mono_pdf": "/out/a.mono.pdf"}).decode(),
+                    orjson.dumps(
+                        [{"type": "a"}, {"type": "b"}, {"type": "c"}]
+                    ).decode(),
+                ),
+                (
+                    "t2",
+                    "PENDING",
+                    "2024-03-01T12:00:00.000001",
+                    "2024-03-01T12:00:00.000001",
+                    None,
+                    0.0,
+                    None,
+                    None,
+                    None,
+                ),
+            ],
+        )
+        conn.commit()
+        conn.close()
+        return db_path
+
+    def test_timestamps_become_integer_micros(self, legacy_db: Path):
+        """Test TEXT timestamps are rebuilt as INTEGER microseconds"""
+        db.init_db()
+        with db.get_connection(readonly=True) as conn:
+            assert db._table_columns(conn, "tasks")["created_at"] == "INTEGER"
+            rows = {
+                row["id"]: row
+                for row in conn.execute(
+                    "SELECT id, created_at, updated_at, typeof(created_at) AS kind FROM tasks"
+                )
+            }
+        assert rows["t1"]["kind"] == "integer"
+        assert rows["t1"]["created_at"] == _micros("2024-01-01T00:00:00.123456")
+        assert rows["t1"]["updated_at"] == _micros("2024-01-02T03:04:05")
+        assert rows["t2"]["created_at"] == _micros("2024-03-01T12:00:00.000001")
+
+    def test_payloads_move_to_side_tables(self, legacy_db: Path):
+        """Test result and events survive the move and the table rebuild"""
+        db.init_db()
+        with db.get_connection(readonly=True) as conn:
+            columns = db._table_columns(conn, "tasks")
+            results = {
+                row["task_id"]: row["result_json"]
+                for row in conn.execute(
+                    "SELECT task_id, result_json FROM task_payloads"
+                )
+            }
+            events = [
+                (row["task_id"], orjson.loads(row["event_json"]))
+                for row in conn.execute(
+                    "SELECT task_id, event_json FROM task_events ORDER BY seq"
+                )
+            ]
+        assert "result_json" not in columns
+        assert "events_json" not in columns
+        assert orjson.loads(results["t1"]) == {"mono_pdf": "/out/a.mono.pdf"}
+        assert results["t2"] is None
+        assert events == [
+            ("t1", {"type": "a"}),
+            ("t1", {"type": "b"}),
+            ("t1", {"type": "c"}),
+        ]
+
+    def test_foreign_keys_still_cascade(self, legacy_db: Path):
+        """Test deleting a migrated task removes its payload and events"""
+        db.init_db()
+        with db.write_transaction() as conn:
+            conn.execute("DELETE FROM tasks WHERE id = 't1'")
+        with db.get_connection(readonly=True) as conn:
+            payloads = conn.execute(
+                "SELECT COUNT(*) FROM task_payloads WHERE task_id = 't1'"
+            ).fetchone()[0]
+            events = conn.execute(
+                "SELECT COUNT(*) FROM task_events WHERE task_id = 't1'"
+            ).fetchone()[0]
+        assert (payloads, events) == (0, 0)
+
+    def test_migration_is_idempotent(self, legacy_db: Path):
+        """Test a second startup leaves migrated rows untouched"""
+        db.init_db()
+        with db.get_connection() as conn:
+            db._create_schema(conn)
+        with db.get_connection(readonly=True) as conn:
+            count = conn.execute("SELECT COUNT(*) FROM task_events").fetchone()[0]
+        assert count == 3
+
+
+class TestConnectionPool:
+    def test_discard_returns_capacity(self, db_path: Path):
+        """Test a waiter gets a connection once the holder's is discarded"""
+        pool = db._ConnectionPool(1, readonly=False)
+        held = pool.acquire()
+        acquired = []
+        waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+        waiter.start()
+        pool.discard(held)
+        waiter.join(timeout=5)
+        assert not waiter.is_alive()
+        assert acquired and acquired[0] is not held
+        pool.discard(acquired[0])
+
+    def test_connection_reused_after_domain_error(self, db_path: Path):
+        """Test non-SQLite exceptions hand the connection back to the pool"""
+        with pytest.raises(KeyError):
+            with db.get_connection() as conn:
+                first = conn
+                raise KeyError("task")
+        with db.get_connection() as conn:
+            assert conn is first
+
+    def test_connection_replaced_after_sqlite_error(self, db_path: Path):
+        """Test a connection that raised sqlite3.Error is closed and replaced"""
+        with pytest.raises(sqlite3.OperationalError):
+            with db.get_connection() as conn:
+                first = conn
+                conn.execute("SELECT * FROM missing_table")
+        with db.get_connection() as conn:
+            assert conn is not first
+        with pytest.raises(sqlite3.ProgrammingError):
+            first.execute("SELECT 1")
+
+    def test_connection_replaced_mid_transaction(self, db_path: Path):
+        """Test a connection left inside a transaction is not reused"""
+        with pytest.raises(KeyError):
+            with db.get_connection() as conn:
+                first = conn
+                conn.execute("BEGIN IMMEDIATE")
+                raise KeyError("task")
+        # BEGIN IMMEDIATE only succeeds if the abandoned write lock was released.
+        with db.write_transaction() as conn:
+            assert conn is not first
@@ -0,0 +1,471 @@
+import asyncio
+import io
+import sqlite3
+import time
+import zipfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from pdf2zh_next import http_api
+from pdf2zh_next.high_level import TranslationError
+from pdf2zh_next.http_api import TaskRecord
+from pdf2zh_next.http_api import TaskStatus
+
+pytestmark = pytest.mark.usefixtures("db_path")
+
+
+@pytest.fixture
+def api(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    """http_api with a fresh database, detail cache and task workspace"""
+    monkeypatch.setattr(
+        http_api, "_detail_cache", http_api._DetailCache(http_api._DETAIL_CACHE_SIZE)
+    )
+    service = http_api.TranslationService(http_api.storage, tmp_path / "tasks")
+    monkeypatch.setattr(http_api, "service", service)
+    return http_api
+
+
+@pytest.fixture
+def settings(tmp_path: Path) -> SimpleNamespace:
+    return SimpleNamespace(
+        pdf=SimpleNamespace(linearize_output=False),
+        translation=SimpleNamespace(output=str(tmp_path / "out")),
+    )
+
+
+@pytest.fixture
+def client(api):
+    with TestClient(api.app) as client:
+        yield client
+
+
+def _stub_stream(monkeypatch: pytest.MonkeyPatch, stream) -> None:
+    monkeypatch.setattr(http_api, "do_translate_async_stream", stream)
+
+
+def _create_task(task_id: str, owner: str = "guest", **fields) -> TaskRecord:
+    now = http_api._now_us()
+    record = TaskRecord(
+        id=task_id,
+        owner=owner,
+        filename="a.pdf",
+        input_path=Path("/in/a.pdf"),
+        output_dir=Path("/out"),
+        status=fields.pop("status", TaskStatus.PENDING),
+        created_at=fields.pop("created_at", now),
+        updated_at=now,
+        **fields,
+    )
+    return asyncio.run(http_api.storage.create(record))
+
+
+def _wait_for_status(client: TestClient, task_id: str) -> dict:
+    for _ in range(200):
+        detail = client.get(f"/api/tasks/{task_id}").json()
+        if detail["status"] in ("DONE", "FAILED"):
+            return detail
+        time.sleep(0.02)
+    raise AssertionError(f"task {task_id} did not finish")
+
+
+def _progress_events(count: int) -> list[dict]:
+    return [{"type": "progress_update", "progress": (i + 1) * 10} for i in range(count)]
+
+
+class TestEventBuffer:
+    def test_events_flushed_before_failure(self, api, settings, monkeypatch):
+        """Test events buffered before a TranslationError are kept"""
+
+        async def stream(_settings, _path):
+            for event in _progress_events(5):
+                yield event
+            raise TranslationError("boom")
+
+        _stub_stream(monkeypatch, stream)
+        _create_task("t1")
+        asyncio.run(api.service._run_task("t1", settings, Path("/in/a.pdf")))
+        record = asyncio.run(api.storage.get("t1"))
+        assert record.status == TaskStatus.FAILED
+        assert record.message == "boom"
+        assert record.events == _progress_events(5)
+        assert record.progress == 50.0
+
+    def test_failed_flush_is_retried(self, api, settings, monkeypatch):
+        """Test a storage error in a background flush loses no events"""
+        extend_events = api.storage.extend_events
+        calls = []
+
+        async def flaky_extend_events(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise sqlite3.OperationalError("database is locked")
+            await extend_events(*args, **kwargs)
+
+        async def stream(_settings, _path):
+            for event in _progress_events(2):
+                yield event
+            # Quiet long enough for the background flusher to run and fail.
+            await asyncio.sleep(http_api._EVENT_BATCH_INTERVAL * 3)
+            raise TranslationError("boom")
+
+        monkeypatch.setattr(api.storage, "extend_events", flaky_extend_events)
+        _stub_stream(monkeypatch, stream)
+        _create_task("t1")
+        asyncio.run(api.service._run_task("t1", settings, Path("/in/a.pdf")))
+        record = asyncio.run(api.storage.get("t1"))
+        assert len(calls) >= 2
+        assert record.status == TaskStatus.FAILED
+        assert record.events == _progress_events(2)
+
+    def test_quiet_stream_progress_is_flushed(self, api, settings, monkeypatch):
+        """Test progress reaches storage while the stream is idle"""
+        seen = {}
+
+        async def stream(_settings, _path):
+            yield {"type": "progress_update", "progress": 30}
+            await asyncio.sleep(http_api._EVENT_BATCH_INTERVAL * 3)
+            seen["record"] = await api.storage.get("t1")
+            yield {"type": "finish", "translate_result": None}
+
+        _stub_stream(monkeypatch, stream)
+        _create_task("t1")
+        asyncio.run(api.service._run_task("t1", settings, Path("/in/a.pdf")))
+        assert seen["record"].status == TaskStatus.RUNNING
+        assert seen["record"].progress == 30.0
+        assert len(seen["record"].events) == 1
+        record = asyncio.run(api.storage.get("t1"))
+        assert record.status == TaskStatus.DONE
+        assert record.result == {"output_dir": settings.translation.output}
+        assert [event["type"] for event in record.events] == [
+            "progress_update",
+            "finish",
+        ]
+
+
+class TestEventTrimming:
+    def _append(self, api, count: int) -> None:
+        encoded = [api._dumps(event) for event in _progress_events(count)]
+        asyncio.run(api.storage.extend_events("t1", encoded, progress=None))
+
+    def test_keeps_newest_events(self, api, monkeypatch):
+        """Test only the newest _MAX_EVENTS events survive, in order"""
+        monkeypatch.setattr(api, "_MAX_EVENTS", 3)
+        _create_task("t1")
+        self._append(api, 5)
+        record = asyncio.run(api.storage.get("t1"))
+        assert record.events == _progress_events(5)[-3:]
+
+    def test_minimum_keeps_terminal_event(self, api, monkeypatch):
+        """Test the smallest allowed limit still keeps the last event"""
+        monkeypatch.setenv("P2Z_MAX_EVENTS", "0")
+        monkeypatch.setattr(api, "_MAX_EVENTS", api._env_int("P2Z_MAX_EVENTS", 512))
+        _create_task("t1")
+        self._append(api, 2)
+        record = asyncio.run(api.storage.get("t1"))
+        assert record.events == _progress_events(2)[-1:]
+
+    @pytest.mark.parametrize(
+        ("raw", "expected"),
+        [(None, 512), ("", 512), ("64", 64), ("0", 1), ("-5", 1), ("many", 512)],
+    )
+    def test_env_int(self, monkeypatch, raw, expected):
+        """Test integer settings fall back or clamp instead of failing"""
+        if raw is None:
+            monkeypatch.delenv("P2Z_MAX_EVENTS", raising=False)
+        else:
+            monkeypatch.setenv("P2Z_MAX_EVENTS", raw)
+        assert http_api._env_int("P2Z_MAX_EVENTS", 512) == expected
+
+
+class TestExpiry:
+    DAY_US = 86_400_000_000
+
+    @pytest.fixture
+    def tasks(self, api) -> dict[str, Path]:
+        now = api._now_us()
+        _create_task("expired", retention_days=1, created_at=now - 2 * self.DAY_US)
+        _create_task("kept", retention_days=7, created_at=now - 2 * self.DAY_US)
+        _create_task("forever", created_at=now - 400 * self.DAY_US)
+        dirs = {}
+        for task_id in ("expired", "kept", "forever"):
+            dirs[task_id] = api.service._workspace / task_id
+            (dirs[task_id] / "output").mkdir(parents=True)
+            (dirs[task_id] / "output" / "a.mono.pdf").write_bytes(b"%PDF-1.4\n")
+        return dirs
+
+    def test_expired_tasks_are_invisible(self, api, tasks):
+        """Test reads skip expired rows before the reaper has run"""
+        with pytest.raises(KeyError):
+            asyncio.run(api.storage.get("expired"))
+        with pytest.raises(KeyError):
+            asyncio.run(api.storage.stamp("expired"))
+        listed = asyncio.run(api.storage.list("guest"))
+        assert sorted(record.id for record in listed) == ["forever", "kept"]
+
+    def test_reaper_removes_rows_and_files(self, api, tasks):
+        """Test one reaper pass deletes expired rows and their workspace"""
+
+        async def one_pass():
+            # The reaper sleeps for _REAP_INTERVAL after its first pass.
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(api._reap_expired_tasks(), timeout=0.5)
+
+        asyncio.run(one_pass())
+        assert not tasks["expired"].exists()
+        assert tasks["kept"].exists()
+        assert tasks["forever"].exists()
+        assert asyncio.run(api.storage.delete_expired()) == []
+
+
+class TestTaskQueue:
+    def test_queued_task_runs_to_completion(self, api, client, monkeypatch):
+        """Test an uploaded task is picked up by a worker and finishes"""
+
+        async def stream(_settings, _path):
+            yield {"type": "progress_update", "progress": 0.5}
+            yield {"type": "finish", "translate_result": None}
+
+        _stub_stream(monkeypatch, stream)
+        response = client.post(
+            "/api/tasks", files={"file": ("a.pdf", b"%PDF-1.4\n", "application/pdf")}
+        )
+        assert response.status_code == 201
+        assert response.json()["status"] == "PENDING"
+        detail = _wait_for_status(client, response.json()["id"])
+        assert detail["status"] == "DONE"
+        assert [event["type"] for event in detail["events"]] == [
+            "progress_update",
+            "finish",
+        ]
+
+    def test_run_skips_tasks_no_longer_pending(self, api, settings, monkeypatch):
+        """Test a task failed while queued is not resurrected as RUNNING"""
+        calls = []
+
+        async def stream(_settings, _path):
+            calls.append(_path)
+            yield {"type": "finish", "translate_result": None}
+
+        _stub_stream(monkeypatch, stream)
+        _create_task("t1", status=TaskStatus.FAILED, message="Interrupted")
+        asyncio.run(api.service._run_task("t1", settings, Path("/in/a.pdf")))
+        record = asyncio.run(api.storage.get("t1"))
+        assert calls == []
+        assert (record.status, record.message) == (TaskStatus.FAILED, "Interrupted")
+
+    def test_shutdown_fails_only_own_tasks(self, api):
+        """Test stopping the service leaves other processes' tasks alone"""
+        future = api._now_us() + api._LEASE_TTL_US
+        own = api.service.instance_id
+        _create_task("mine", claimed_by=own, lease_expires=future)
+        _create_task(
+            "running",
+            status=TaskStatus.RUNNING,
+            claimed_by=own,
+            lease_expires=future,
+        )
+        _create_task("sibling", claimed_by="other", lease_expires=future)
+        asyncio.run(api.service.stop())
+        statuses = {
+            task_id: asyncio.run(api.storage.get(task_id)).status
+            for task_id in ("mine", "running", "sibling")
+        }
+        assert statuses == {
+            "mine": TaskStatus.FAILED,
+            "running": TaskStatus.FAILED,
+            "sibling": TaskStatus.PENDING,
+        }
+
+    def test_abandoned_tasks_fail_once_lease_expires(self, api):
+        """Test tasks of a vanished process fail after their lease runs out"""
+        now = api._now_us()
+        _create_task("live", claimed_by="other", lease_expires=now + 60_000_000)
+        _create_task("stale", claimed_by="gone", lease_expires=now - 1)
+        _create_task("unclaimed", status=TaskStatus.RUNNING)
+        _create_task("done", status=TaskStatus.DONE, lease_expires=now - 1)
+        assert asyncio.run(api.storage.fail_abandoned("abandoned")) == 2
+        statuses = {
+            task_id: asyncio.run(api.storage.get(task_id)).status
+            for task_id in ("live", "stale", "unclaimed", "done")
+        }
+        assert statuses == {
+            "live": TaskStatus.PENDING,
+            "stale": TaskStatus.FAILED,
+            "unclaimed": TaskStatus.FAILED,
+            "done": TaskStatus.DONE,
+        }
+
+    def test_renewal_extends_own_leases(self, api):
+        """Test the reaper loop keeps this process's leases from expiring"""
+        own = api.service.instance_id
+        _create_task("mine", claimed_by=own, lease_expires=api._now_us() - 1)
+        asyncio.run(api.service.renew_leases())
+        assert asyncio.run(api.storage.fail_abandoned("abandoned")) == 0
+        record = asyncio.run(api.storage.get("mine"))
+        assert record.lease_expires > api._now_us()
+
+
+async def _idle_stream(_settings, _path):
+    return
+    yield
+
+
+class TestTaskDetail:
+    @pytest.fixture
+    def task(self, api, client, monkeypatch) -> str:
+        _stub_stream(monkeypatch, _idle_stream)
+        _create_task("t1", status=TaskStatus.DONE, progress=1.0)
+        return "t1"
+
+    def test_etag_answers_304_until_task_changes(self, api, client, task):
+        """Test If-None-Match gets a 304 until the task is updated"""
+        first = client.get(f"/api/tasks/{task}")
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+        cached = client.get(f"/api/tasks/{task}", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+        asyncio.run(api.storage.append_event(task, {"type": "note"}))
+        changed = client.get(f"/api/tasks/{task}", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != etag
+        assert changed.json()["events"] == [{"type": "note"}]
+
+    def test_detail_body_is_cached_per_stamp(self, api, client, task):
+        """Test the serialized body is cached under the task's updated_at"""
+        body = client.get(f"/api/tasks/{task}").content
+        updated_at = asyncio.run(api.storage.stamp(task))[1]
+        assert api._detail_cache.get(task, updated_at) == body
+        assert api._detail_cache.get(task, updated_at + 1) is None
+
+    def test_other_owners_get_404(self, api, client, task):
+        """Test tasks of another user are indistinguishable from missing ones"""
+        _create_task("t2", owner="alice", status=TaskStatus.DONE)
+        assert client.get("/api/tasks/t2").status_code == 404
+        assert client.get("/api/tasks/missing").status_code == 404
+
+    def test_detail_cache_evicts_least_recent(self):
+        """Test the cache keeps at most its size, dropping the oldest entry"""
+        cache = http_api._DetailCache(2)
+        cache.put("a", 1, b"a")
+        cache.put("b", 1, b"b")
+        assert cache.get("a", 1) == b"a"
+        cache.put("c", 1, b"c")
+        assert cache.get("b", 1) is None
+        assert cache.get("a", 1) == b"a"
+        cache.discard("a")
+        assert cache.get("a", 1) is None
+
+
+class TestArchive:
+    @pytest.fixture
+    def output_dir(self, api, client, tmp_path, monkeypatch) -> Path:
+        _stub_stream(monkeypatch, _idle_stream)
+        output_dir = tmp_path / "result"
+        (output_dir / "nested").mkdir(parents=True)
+        (output_dir / "a.mono.pdf").write_bytes(b"%PDF-mono" * 1000)
+        (output_dir / "nested" / "notes.txt").write_text("hello")
+        _create_task(
+            "t1",
+            status=TaskStatus.DONE,
+            result={"output_dir": str(output_dir)},
+        )
+        return output_dir
+
+    def test_iter_archive_stores_every_file(self, output_dir):
+        """Test the streamed zip holds every file uncompressed"""
+        data = b"".join(http_api._iter_archive(output_dir))
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            assert sorted(archive.namelist()) == ["a.mono.pdf", "nested/notes.txt"]
+            assert {info.compress_type for info in archive.infolist()} == {
+                zipfile.ZIP_STORED
+            }
+            assert archive.read("nested/notes.txt") == b"hello"
+
+    def test_download_and_conditional_requests(self, client, output_dir):
+        """Test the archive endpoint honours ETag and Last-Modified"""
+        response = client.get("/api/tasks/t1/archive")
+        assert response.status_code == 200
+        assert response.headers["content-disposition"] == (
+            'attachment; filename="t1.zip"'
+        )
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            assert archive.read("a.mono.pdf") == b"%PDF-mono" * 1000
+        etag = response.headers["etag"]
+        last_modified = response.headers["last-modified"]
+
+        def status_for(**headers) -> int:
+            return client.get("/api/tasks/t1/archive", headers=headers).status_code
+
+        assert status_for(**{"If-None-Match": etag}) == 304
+        assert status_for(**{"If-Modified-Since": last_modified}) == 304
+        old = "Thu, 01 Jan 1970 00:00:00 GMT"
+        assert status_for(**{"If-Modified-Since": old}) == 200
+        assert status_for(**{"If-Modified-Since": "garbage"}) == 200
+        # If-None-Match wins over If-Modified-Since.
+        assert (
+            status_for(
+                **{"If-None-Match": '"stale"', "If-Modified-Since": last_modified}
+            )
+            == 200
+        )
+
+    def test_new_output_changes_etag(self, client, output_dir):
+        """Test writing a newer output file invalidates the ETag"""
+        etag = client.get("/api/tasks/t1/archive").headers["etag"]
+        time.sleep(0.01)
+        (output_dir / "a.dual.pdf").write_bytes(b"%PDF-dual")
+        response = client.get("/api/tasks/t1/archive", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+
+
+class TestRawUpload:
+    @pytest.fixture(autouse=True)
+    def idle(self, monkeypatch) -> None:
+        _stub_stream(monkeypatch, _idle_stream)
+
+    def test_body_is_written_to_the_workspace(self, api, client):
+        """Test a multi-chunk application/pdf body lands on disk intact"""
+        body = b"%PDF-1.4 " + bytes(range(256)) * (3 * api._UPLOAD_CHUNK_SIZE // 256)
+        response = client.post(
+            "/api/tasks/raw?filename=paper.pdf",
+            content=body,
+            headers={"Content-Type": "application/pdf"},
+        )
+        assert response.status_code == 201
+        detail = response.json()
+        assert detail["filename"] == "paper.pdf"
+        stored = api.service._workspace / detail["id"] / "input" / "paper.pdf"
+        assert stored.read_bytes() == body
+
+    def test_missing_suffix_is_added(self, client):
+        """Test filenames without .pdf get the suffix appended"""
+        response = client.post(
+            "/api/tasks/raw?filename=../paper",
+            content=b"%PDF-1.4\n",
+            headers={"Content-Type": "application/pdf; charset=binary"},
+        )
+        assert response.status_code == 201
+        assert response.json()["filename"] == "paper.pdf"
+
+    def test_rejects_other_content_types(self, client):
+        """Test non-PDF bodies are refused with 415"""
+        response = client.post(
+            "/api/tasks/raw",
+            content=b"%PDF-1.4\n",
+            headers={"Content-Type": "application/octet-stream"},
+        )
+        assert response.status_code == 415
+
+    def test_rejects_invalid_config(self, client):
+        """Test malformed config overrides are refused with 400"""
+        response = client.post(
+            "/api/tasks/raw?config=%5B%5D",
+            content=b"%PDF-1.4\n",
+            headers={"Content-Type": "application/pdf"},
+        )
+        assert response.status_code == 400